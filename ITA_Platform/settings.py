@@ -93,6 +93,24 @@ DATABASES = {
 #     }
 # }
 
+# Cache
+# Cached statistics are invalidated by bumping version keys, so every worker
+# process must share one cache. Outside DEBUG the database cache is used,
+# which needs no extra service; create its table with
+# `python manage.py createcachetable`. The per-process local memory cache is
+# only suitable for a single development server. Point CACHE_BACKEND and
+# CACHE_LOCATION at Redis or Memcached where available.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache' if DEBUG
+            else 'django.core.cache.backends.db.DatabaseCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'django_cache'),
+    }
+}
+
 # Custom User Model
 AUTH_USER_MODEL = 'accounts.User'
 
@@ -153,6 +171,9 @@ REST_FRAMEWORK = {
         'rest_framework.renderers.JSONRenderer',
         'rest_framework.renderers.BrowsableAPIRenderer',
     ],
+    'DEFAULT_THROTTLE_RATES': {
+        'anon': '60/minute',  # Public endpoints, e.g. certificate verification
+    },
     'EXCEPTION_HANDLER': 'rest_framework.views.exception_handler',
     'DATETIME_FORMAT': '%Y-%m-%d %H:%M:%S',
     'DATE_FORMAT': '%Y-%m-%d',
@@ -228,6 +249,17 @@ LOGGING = {
             'level': 'DEBUG',
             'propagate': False,
         },
+        'enrollments': {
+            'handlers': ['console', 'file'],
+            # Per-save status logs are noisy under load; keep them to dev
+            'level': 'INFO' if DEBUG else 'WARNING',
+            'propagate': False,
+        },
+        'payments': {
+            'handlers': ['console', 'file'],
+            'level': 'INFO' if DEBUG else 'WARNING',
+            'propagate': False,
+        },
     },
 }
 
@@ -257,6 +289,18 @@ CSRF_TRUSTED_ORIGINS = [
     'http://localhost:8000',
 ]
 
+# Bulk enrollment imports (Enrollment.bulk_enroll)
+ENROLLMENT_BULK_BATCH_SIZE = int(os.getenv('ENROLLMENT_BULK_BATCH_SIZE', 500))
+
+# Rows fetched per round trip when streaming the enrollment CSV export
+ENROLLMENT_EXPORT_CHUNK_SIZE = int(os.getenv('ENROLLMENT_EXPORT_CHUNK_SIZE', 2000))
+
+# Bulk payment recording (BulkPaymentSerializer)
+PAYMENT_BULK_BATCH_SIZE = int(os.getenv('PAYMENT_BULK_BATCH_SIZE', 500))
+
+# Rows fetched per round trip when streaming the payment CSV export
+PAYMENT_EXPORT_CHUNK_SIZE = int(os.getenv('PAYMENT_EXPORT_CHUNK_SIZE', 2000))
+
 # Security Settings (for production)
 if not DEBUG:
     SECURE_SSL_REDIRECT = True
@@ -9,6 +9,4 @@ class CertificationsConfig(AppConfig):
     
     def ready(self):
         """Import signals when app is ready."""
-        # Import signals here if you create any
-        # import certifications.signals
-        pass
\ No newline at end of file
+        import certifications.signals
\ No newline at end of file
@@ -1,8 +1,26 @@
 # certifications app
 import django_filters
+from django_filters.rest_framework import DjangoFilterBackend
 from .models import Certificate
 
 
+class LazyDjangoFilterBackend(DjangoFilterBackend):
+    """
+    DjangoFilterBackend that skips building and validating the filterset
+    when none of its filters appear in the query string.
+    """
+    
+    def filter_queryset(self, request, queryset, view):
+        filterset_class = self.get_filterset_class(view, queryset)
+        if filterset_class is None:
+            return queryset
+        
+        if not any(name in request.query_params for name in filterset_class.base_filters):
+            return queryset
+        
+        return super().filter_queryset(request, queryset, view)
+
+
 class CertificateFilter(django_filters.FilterSet):
     """Filter set for Certificate model."""
     
@@ -17,6 +35,16 @@ class CertificateFilter(django_filters.FilterSet):
         lookup_expr='lte',
         label='Issue date to'
     )
+    start_date = django_filters.DateFilter(
+        field_name='issue_date',
+        lookup_expr='gte',
+        label='Start date'
+    )
+    end_date = django_filters.DateFilter(
+        field_name='issue_date',
+        lookup_expr='lte',
+        label='End date'
+    )
     
     # Student filters
     student = django_filters.NumberFilter(
@@ -68,8 +96,8 @@ class CertificateFilter(django_filters.FilterSet):
         model = Certificate
         fields = [
             'is_public', 'issue_date_from', 'issue_date_to',
-            'student', 'course', 'course_level', 'course_category',
-            'issued_by'
+            'start_date', 'end_date', 'student', 'course',
+            'course_level', 'course_category', 'issued_by'
         ]
     
     def filter_has_file(self, queryset, name, value):
@@ -3,9 +3,22 @@ from django.db import models
 from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.utils import timezone
+import hashlib
 import uuid
 
 
+class CertificateManager(models.Manager):
+    """Manager for Certificate with shared queryset helpers."""
+    
+    def with_related(self):
+        """Return certificates with student, course and issuer joined in."""
+        return self.select_related(
+            'enrollment__student',
+            'enrollment__course',
+            'issued_by'
+        )
+
+
 class Certificate(models.Model):
     """Model for student certificates."""
     
@@ -54,6 +67,8 @@ class Certificate(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
     
+    objects = CertificateManager()
+    
     class Meta:
         db_table = 'certifications_certificate'
         verbose_name = 'Certificate'
@@ -188,23 +203,39 @@ class Certificate(models.Model):
         self.save()
         return self.is_public
     
+    @staticmethod
+    def verification_cache_key(verification_code):
+        """Return the cache key for a public verification lookup."""
+        digest = hashlib.md5(verification_code.encode('utf-8')).hexdigest()
+        return f"certificate:verify:{digest}"
+    
     @classmethod
     def verify_certificate(cls, verification_code):
         """
         Verify a certificate by its verification code.
         Returns the certificate if valid and public, None otherwise.
         """
-        try:
-            certificate = cls.objects.select_related(
-                'enrollment__student',
-                'enrollment__course'
-            ).get(
-                verification_code=verification_code,
-                is_public=True
-            )
-            return certificate
-        except cls.DoesNotExist:
-            return None
+        # Only load the columns PublicCertificateSerializer renders; the
+        # lookup itself is a seek on the unique verification_code index.
+        return cls.objects.select_related(
+            'enrollment__student',
+            'enrollment__course'
+        ).only(
+            'id',
+            'certificate_number',
+            'verification_code',
+            'issue_date',
+            'is_public',
+            'enrollment__completion_date',
+            'enrollment__student__first_name',
+            'enrollment__student__last_name',
+            'enrollment__course__title',
+            'enrollment__course__level',
+            'enrollment__course__duration'
+        ).filter(
+            verification_code=verification_code,
+            is_public=True
+        ).first()
     
     @classmethod
     def get_pending_certificates(cls):
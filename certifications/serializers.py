@@ -1,11 +1,31 @@
 # certifications app
 from rest_framework import serializers
 from django.utils import timezone
+from urllib.parse import urljoin
 from .models import Certificate
 from enrollments.serializers import EnrollmentListSerializer
 
 
-class CertificateSerializer(serializers.ModelSerializer):
+class CertificateURLMixin:
+    """Build absolute certificate file URLs, resolving the host once per serializer."""
+    
+    def get_base_url(self):
+        """Return the request's site root, cached for the rest of the serialization."""
+        if not hasattr(self, '_base_url'):
+            request = self.context.get('request')
+            self._base_url = request.build_absolute_uri('/') if request else None
+        return self._base_url
+    
+    def get_certificate_url(self, obj):
+        """Get certificate file URL if exists."""
+        if obj.certificate_file:
+            base_url = self.get_base_url()
+            if base_url:
+                return urljoin(base_url, obj.certificate_file.url)
+        return None
+
+
+class CertificateSerializer(CertificateURLMixin, serializers.ModelSerializer):
     """Full serializer for Certificate model."""
     
     student_name = serializers.CharField(source='enrollment.student.get_full_name', read_only=True)
@@ -36,14 +56,6 @@ class CertificateSerializer(serializers.ModelSerializer):
     def get_duration_days(self, obj):
         """Get enrollment duration in days."""
         return obj.get_duration_days()
-    
-    def get_certificate_url(self, obj):
-        """Get certificate file URL if exists."""
-        if obj.certificate_file:
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.certificate_file.url)
-        return None
 
 
 class CertificateListSerializer(serializers.ModelSerializer):
@@ -195,7 +207,7 @@ class CertificateVerificationSerializer(serializers.Serializer):
         return value.strip()
 
 
-class StudentCertificateSerializer(serializers.ModelSerializer):
+class StudentCertificateSerializer(CertificateURLMixin, serializers.ModelSerializer):
     """Serializer for students viewing their own certificates."""
     
     course_title = serializers.CharField(source='enrollment.course.title', read_only=True)
@@ -220,14 +232,6 @@ class StudentCertificateSerializer(serializers.ModelSerializer):
         """Get enrollment duration in days."""
         return obj.get_duration_days()
     
-    def get_certificate_url(self, obj):
-        """Get certificate file URL if exists."""
-        if obj.certificate_file:
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.certificate_file.url)
-        return None
-    
     def get_can_download(self, obj):
         """Check if certificate file is available for download."""
         return bool(obj.certificate_file)
@@ -4,12 +4,23 @@ Signals for automatic certificate-related actions.
 Uncomment and modify based on your business requirements.
 """
 
-from django.db.models.signals import post_save
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from enrollments.models import Enrollment
 from .models import Certificate
 
 
+@receiver(post_save, sender=Certificate)
+@receiver(post_delete, sender=Certificate)
+def invalidate_verification_cache(sender, instance, **kwargs):
+    """
+    Drop the cached public verification result whenever a certificate
+    is saved (e.g. visibility toggled) or deleted.
+    """
+    cache.delete(Certificate.verification_cache_key(instance.verification_code))
+
+
 # Example: Auto-issue certificate when enrollment is completed
 # Uncomment if you want automatic certificate generation
 
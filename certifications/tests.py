@@ -1,4 +1,5 @@
 # certifications app
+from django.core.cache import cache
 from django.test import TestCase
 from django.utils import timezone
 from django.core.exceptions import ValidationError
@@ -172,4 +173,26 @@ class CertificateAPITest(TestCase):
         # You would need to set up DRF test client and authentication
         pass
     
-    # Add API test cases here when implementing
\ No newline at end of file
+    # Add API test cases here when implementing
+
+
+class PublicVerificationAPITest(TestCase):
+    """Test cases for the public certificate verification endpoint."""
+    
+    def setUp(self):
+        """Start each test with an empty cache."""
+        cache.clear()
+    
+    def test_verify_unknown_code(self):
+        """Test that an unknown code is reported as invalid on repeat lookups."""
+        url = '/api/certifications/public/certificates/verify/'
+        
+        for _ in range(2):
+            response = self.client.get(url, {'code': 'does-not-exist'})
+            self.assertEqual(response.status_code, 404)
+            self.assertFalse(response.json()['valid'])
+    
+    def test_verify_requires_code(self):
+        """Test that a missing code is rejected."""
+        response = self.client.get('/api/certifications/public/certificates/verify/')
+        self.assertEqual(response.status_code, 400)
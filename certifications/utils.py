@@ -5,6 +5,7 @@ Utility functions for certificate generation and management.
 
 from django.conf import settings
 from django.utils import timezone
+from urllib.parse import urlencode
 import os
 
 from io import BytesIO
@@ -901,6 +902,10 @@ def bulk_issue_certificates(enrollment_ids, issued_by, issue_date=None, is_publi
     success_count = 0
     errors = []
     
+    # Work out the starting sequence once instead of counting per certificate
+    year = timezone.now().year
+    sequence = Certificate.objects.filter(issue_date__year=year).count() + 1
+    
     enrollments = Enrollment.objects.filter(id__in=enrollment_ids)
     
     for enrollment in enrollments:
@@ -916,11 +921,13 @@ def bulk_issue_certificates(enrollment_ids, issued_by, issue_date=None, is_publi
         try:
             Certificate.objects.create(
                 enrollment=enrollment,
+                certificate_number=format_certificate_number(year, sequence),
                 issue_date=issue_date,
                 is_public=is_public,
                 issued_by=issued_by
             )
             success_count += 1
+            sequence += 1
         except Exception as e:
             errors.append({
                 'enrollment_id': enrollment.id,
@@ -941,31 +948,33 @@ def format_certificate_number(year, sequence):
     Returns:
         str: Formatted certificate number
     """
-    return f"CERT-{year}-{sequence:06d}"
+    return "CERT-%d-%06d" % (year, sequence)
 
 
-def get_verification_url(certificate, request=None):
+def get_verification_url(certificate, request=None, base_url=None):
     """
     Get the full URL for certificate verification.
     
     Args:
         certificate: Certificate instance
         request: HttpRequest object (optional)
+        base_url: Precomputed site root, e.g. once per request (optional)
     
     Returns:
         str: Full verification URL
     """
-    from django.urls import reverse
+    if base_url is None:
+        if request:
+            base_url = request.build_absolute_uri('/')
+        else:
+            base_url = getattr(settings, 'SITE_URL', 'http://localhost:8000/')
     
-    if request:
-        base_url = request.build_absolute_uri('/')
-    else:
-        base_url = getattr(settings, 'SITE_URL', 'http://localhost:8000/')
-    
-    # Remove trailing slash
+    # Remove trailing slash; any path prefix in the base URL is kept
     base_url = base_url.rstrip('/')
     
     # Build verification URL
-    verification_path = f"/api/certifications/public/certificates/verify/?code={certificate.verification_code}"
+    verification_path = "/api/certifications/public/certificates/verify/?" + urlencode(
+        {'code': certificate.verification_code}
+    )
     
-    return f"{base_url}{verification_path}"
\ No newline at end of file
+    return f"{base_url}{verification_path}"
@@ -3,7 +3,8 @@ from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework.throttling import AnonRateThrottle
+from django.core.cache import cache
 from django.db.models import Count, Q
 from django.utils import timezone
 from django.http import FileResponse, Http404
@@ -18,19 +19,15 @@ from .serializers import (
     PendingCertificateSerializer, CertificateStatisticsSerializer
 )
 from .permissions import IsAdminOrAcademic
-from .filters import CertificateFilter
+from .filters import CertificateFilter, LazyDjangoFilterBackend
 
 
 class CertificateViewSet(viewsets.ModelViewSet):
     """ViewSet for managing certificates (Admin/Academic staff)."""
     
-    queryset = Certificate.objects.select_related(
-        'enrollment__student',
-        'enrollment__course',
-        'issued_by'
-    )
+    queryset = Certificate.objects.with_related()
     permission_classes = [IsAdminOrAcademic]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [LazyDjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_class = CertificateFilter
     search_fields = [
         'certificate_number',
@@ -59,39 +56,11 @@ class CertificateViewSet(viewsets.ModelViewSet):
         return CertificateSerializer
     
     def get_queryset(self):
-        """Filter queryset based on query parameters."""
-        queryset = Certificate.objects.select_related(
-            'enrollment__student',
-            'enrollment__course',
-            'issued_by'
-        )
-        
-        # Filter by student
-        student_id = self.request.query_params.get('student', None)
-        if student_id:
-            queryset = queryset.filter(enrollment__student_id=student_id)
-        
-        # Filter by course
-        course_id = self.request.query_params.get('course', None)
-        if course_id:
-            queryset = queryset.filter(enrollment__course_id=course_id)
-        
-        # Filter by date range
-        start_date = self.request.query_params.get('start_date', None)
-        end_date = self.request.query_params.get('end_date', None)
-        
-        if start_date:
-            queryset = queryset.filter(issue_date__gte=start_date)
-        if end_date:
-            queryset = queryset.filter(issue_date__lte=end_date)
-        
-        # Filter by public status
-        is_public = self.request.query_params.get('is_public', None)
-        if is_public is not None:
-            is_public = is_public.lower() == 'true'
-            queryset = queryset.filter(is_public=is_public)
-        
-        return queryset
+        """
+        Return certificates with related objects loaded.
+        Query parameter filtering is handled by CertificateFilter.
+        """
+        return Certificate.objects.with_related()
     
     @action(detail=True, methods=['get'])
     def download(self, request, pk=None):
@@ -202,7 +171,7 @@ class CertificateViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def statistics(self, request):
         """Get comprehensive certificate statistics."""
-        queryset = self.get_queryset()
+        queryset = self.filter_queryset(self.get_queryset())
         
         # Basic counts
         total_certificates = queryset.count()
@@ -248,22 +217,30 @@ class CertificateViewSet(viewsets.ModelViewSet):
         
         certificates_by_course = [
             {
-                'course_id': course.id,
-                'course_title': course.title,
-                'certificate_count': course.certificate_count
+                'course_id': course['id'],
+                'course_title': course['title'],
+                'certificate_count': course['certificate_count']
             }
-            for course in courses_with_certs
+            for course in courses_with_certs.values('id', 'title', 'certificate_count')
         ]
         
         # Recent certificates
-        recent = queryset.order_by('-issue_date')[:5]
+        recent = queryset.order_by('-issue_date').values(
+            'id',
+            'certificate_number',
+            'issue_date',
+            'enrollment__student__first_name',
+            'enrollment__student__last_name',
+            'enrollment__course__title'
+        )[:5]
         recent_certificates = [
             {
-                'id': cert.id,
-                'certificate_number': cert.certificate_number,
-                'student_name': cert.get_student_name(),
-                'course_title': cert.get_course_title(),
-                'issue_date': cert.issue_date
+                'id': cert['id'],
+                'certificate_number': cert['certificate_number'],
+                'student_name': f"{cert['enrollment__student__first_name']} "
+                                f"{cert['enrollment__student__last_name']}".strip(),
+                'course_title': cert['enrollment__course__title'],
+                'issue_date': cert['issue_date']
             }
             for cert in recent
         ]
@@ -326,10 +303,48 @@ class StudentCertificateViewSet(viewsets.ReadOnlyModelViewSet):
             )
 
 
+# How long a public verification result is served from cache (seconds)
+VERIFICATION_CACHE_TIMEOUT = 300
+
+
+def get_public_certificate_data(verification_code):
+    """
+    Return serialized public certificate data for a verification code,
+    or None if no public certificate matches. Results (including misses)
+    are cached and invalidated by the Certificate save/delete signals.
+    """
+    def lookup():
+        certificate = Certificate.verify_certificate(verification_code)
+        if certificate is None:
+            return None
+        return dict(PublicCertificateSerializer(certificate).data)
+    
+    return cache.get_or_set(
+        Certificate.verification_cache_key(verification_code),
+        lookup,
+        timeout=VERIFICATION_CACHE_TIMEOUT
+    )
+
+
 class PublicCertificateViewSet(viewsets.ViewSet):
     """Public-facing certificate verification endpoint."""
     
     permission_classes = [AllowAny]
+    throttle_classes = [AnonRateThrottle]
+    
+    def _verification_response(self, verification_code):
+        """Build the verification response for a code."""
+        certificate_data = get_public_certificate_data(verification_code)
+        
+        if certificate_data is not None:
+            return Response({
+                'valid': True,
+                'certificate': certificate_data
+            })
+        return Response({
+            'valid': False,
+            'message': 'Certificate not found or is not publicly available.'
+        }, status=status.HTTP_404_NOT_FOUND)
     
     @action(detail=False, methods=['get', 'post'])
     def verify(self, request):
@@ -347,19 +362,7 @@ class PublicCertificateViewSet(viewsets.ViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        certificate = Certificate.verify_certificate(verification_code)
-        
-        if certificate:
-            serializer = PublicCertificateSerializer(certificate)
-            return Response({
-                'valid': True,
-                'certificate': serializer.data
-            })
-        else:
-            return Response({
-                'valid': False,
-                'message': 'Certificate not found or is not publicly available.'
-            }, status=status.HTTP_404_NOT_FOUND)
+        return self._verification_response(verification_code)
     
     @action(detail=False, methods=['get'], url_path='verify/(?P<verification_code>[^/.]+)')
     def verify_by_code(self, request, verification_code=None):
@@ -370,16 +373,4 @@ class PublicCertificateViewSet(viewsets.ViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        certificate = Certificate.verify_certificate(verification_code)
-        
-        if certificate:
-            serializer = PublicCertificateSerializer(certificate)
-            return Response({
-                'valid': True,
-                'certificate': serializer.data
-            })
-        else:
-            return Response({
-                'valid': False,
-                'message': 'Certificate not found or is not publicly available.'
-            }, status=status.HTTP_404_NOT_FOUND)
\ No newline at end of file
+        return self._verification_response(verification_code)
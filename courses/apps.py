@@ -8,6 +8,4 @@ class CoursesConfig(AppConfig):
     
     def ready(self):
         """Import signals when app is ready."""
-        # Import signals here if you create any
-        # import courses.signals
-        pass
\ No newline at end of file
+        import courses.signals
\ No newline at end of file
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-15 22:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['price'], name='courses_cou_price_1fbd18_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['duration'], name='courses_cou_duratio_972589_idx'),
+        ),
+    ]
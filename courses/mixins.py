@@ -0,0 +1,96 @@
+# courses app
+from functools import lru_cache
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+
+def _reads_related_object(field):
+    """Return True if the field renders the related object, not just its pk."""
+    if isinstance(field, serializers.BaseSerializer):
+        return True
+    return (
+        isinstance(field, serializers.RelatedField) and
+        not field.use_pk_only_optimization()
+    )
+
+
+def _forward_path(model, field):
+    """
+    Return the relations a field reads through that can be joined with
+    select_related (forward FK / one-to-one hops), in ORM ``__`` form.
+    """
+    attrs = field.source.split('.')
+    if not _reads_related_object(field):
+        # The last attribute is a value on the final model, not a hop
+        attrs = attrs[:-1]
+    
+    parts = []
+    for attr in attrs:
+        try:
+            field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            break
+        if not field.is_relation or field.many_to_many or field.one_to_many:
+            break
+        parts.append(attr)
+        model = field.related_model
+    return '__'.join(parts)
+
+
+def _nested_prefetch(model, source, child):
+    """Build a Prefetch for a nested many=True ModelSerializer."""
+    related_model = model._meta.get_field(source).related_model
+    queryset = related_model._default_manager.all()
+    
+    # Only restrict columns when every nested field is a plain model field;
+    # anything else (dotted sources, methods) may need deferred columns
+    concrete = {f.name for f in related_model._meta.concrete_fields}
+    sources = [field.source for field in child.fields.values()]
+    if all(name in concrete for name in sources):
+        queryset = queryset.only(related_model._meta.pk.name, *sources)
+    
+    return Prefetch(source, queryset=queryset)
+
+
+@lru_cache(maxsize=None)
+def serializer_query_plan(serializer_class):
+    """
+    Work out the select_related paths and prefetches a serializer needs.
+    Returns a ``(select_related, prefetches)`` tuple; cached per class.
+    """
+    model = serializer_class.Meta.model
+    select_related = set()
+    prefetches = []
+    
+    for field in serializer_class().fields.values():
+        source = field.source
+        if source == '*':
+            continue
+        
+        if isinstance(field, serializers.ListSerializer):
+            if isinstance(field.child, serializers.ModelSerializer):
+                prefetches.append(_nested_prefetch(model, source, field.child))
+            continue
+        
+        path = _forward_path(model, field)
+        if path:
+            select_related.add(path)
+    
+    return tuple(sorted(select_related)), tuple(prefetches)
+
+
+class SerializerDrivenPrefetchMixin:
+    """
+    Apply the select_related/prefetch_related calls the active serializer
+    needs, so the queryset stays in sync as serializer fields change.
+    """
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        select_related, prefetches = serializer_query_plan(self.get_serializer_class())
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetches:
+            queryset = queryset.prefetch_related(*prefetches)
+        return queryset
@@ -1,10 +1,14 @@
 # courses app
-from django.db import models
+from django.db import connection, models
 from django.conf import settings
+from django.core.cache import cache
 from django.core.validators import MinValueValidator, MaxValueValidator
 from decimal import Decimal
 
 
+STATISTICS_VERSION_KEY = 'course:stats:ver'
+
+
 class Category(models.Model):
     """Course category model."""
     
@@ -26,7 +30,13 @@ class Category(models.Model):
         return self.name
     
     def get_active_courses_count(self):
-        """Return count of active courses in this category."""
+        """
+        Return count of active courses in this category.
+        Uses the ``active_courses`` annotation when the queryset provides one,
+        so listings can batch the counts into a single GROUP BY.
+        """
+        if hasattr(self, 'active_courses'):
+            return self.active_courses
         return self.courses.filter(is_active=True).count()
 
 
@@ -91,23 +101,58 @@ class Course(models.Model):
         indexes = [
             models.Index(fields=['level', 'is_active']),
             models.Index(fields=['category', 'is_active']),
+            # Range filters (min/max price and duration)
+            models.Index(fields=['price']),
+            models.Index(fields=['duration']),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(price__gte=0),
+                name='course_price_nonneg'
+            ),
+            models.CheckConstraint(
+                condition=models.Q(duration__gte=1),
+                name='course_duration_ge1'
+            ),
         ]
     
     def __str__(self):
         return f"{self.title} ({self.get_level_display()})"
     
+    def get_category_name(self):
+        """Return the category name, preferring a ``category_name`` annotation."""
+        if hasattr(self, 'category_name'):
+            return self.category_name
+        return self.category.name if self.category_id else None
+    
+    # The count helpers below return the matching queryset annotation
+    # (e.g. ``enrollment_count``) when present, so list endpoints can
+    # compute them for every row in a single query.
+    
     def get_enrollment_count(self):
         """Return total number of enrollments for this course."""
+        if hasattr(self, 'enrollment_count'):
+            return self.enrollment_count
         return self.enrollments.count()
     
     def get_active_enrollment_count(self):
         """Return number of active (in-progress) enrollments."""
+        if hasattr(self, 'active_enrollment_count'):
+            return self.active_enrollment_count
         return self.enrollments.filter(status='IN_PROGRESS').count()
     
     def get_completion_count(self):
         """Return number of completed enrollments."""
+        if hasattr(self, 'completion_count'):
+            return self.completion_count
         return self.enrollments.filter(status='COMPLETED').count()
     
+    def get_prerequisite_count(self):
+        """Return number of prerequisite courses."""
+        if hasattr(self, 'prerequisite_count'):
+            return self.prerequisite_count
+        return self.prerequisites.count()
+    
     def get_completion_rate(self):
         """Calculate completion rate as percentage."""
         total = self.get_enrollment_count()
@@ -126,4 +171,35 @@ class Course(models.Model):
     
     def is_prerequisite_for(self, course):
         """Check if this course is a prerequisite for given course."""
-        return course.prerequisites.filter(id=self.id).exists()
\ No newline at end of file
+        return course.prerequisites.filter(id=self.id).exists()
+    
+    @staticmethod
+    def statistics_cache_key():
+        """Return the cache key for the current version of the statistics payload."""
+        version = cache.get(STATISTICS_VERSION_KEY, 0)
+        return f"course:stats:v{version}"
+    
+    @staticmethod
+    def invalidate_statistics_cache():
+        """Bump the statistics version so the next request recomputes it."""
+        cache.add(STATISTICS_VERSION_KEY, 0, None)
+        cache.incr(STATISTICS_VERSION_KEY)
+    
+    def get_dependent_ids(self):
+        """Return ids of courses that require this course, directly or transitively."""
+        through = self.prerequisites.through
+        quote_name = connection.ops.quote_name
+        table = quote_name(through._meta.db_table)
+        from_col = quote_name(through._meta.get_field('from_course').column)
+        to_col = quote_name(through._meta.get_field('to_course').column)
+        # UNION (not UNION ALL) so existing cycles cannot recurse forever
+        sql = (
+            f"WITH RECURSIVE deps(course_id) AS ("
+            f"SELECT {from_col} FROM {table} WHERE {to_col} = %s "
+            f"UNION SELECT cp.{from_col} FROM {table} cp "
+            f"JOIN deps ON cp.{to_col} = deps.course_id"
+            f") SELECT course_id FROM deps"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [self.pk])
+            return {row[0] for row in cursor.fetchall()}
@@ -6,7 +6,9 @@ from .models import Category, Course
 class CategorySerializer(serializers.ModelSerializer):
     """Serializer for Category model."""
     
-    active_courses_count = serializers.SerializerMethodField()
+    active_courses_count = serializers.IntegerField(
+        source='get_active_courses_count', read_only=True
+    )
     
     class Meta:
         model = Category
@@ -15,10 +17,6 @@ class CategorySerializer(serializers.ModelSerializer):
             'active_courses_count', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
-    
-    def get_active_courses_count(self, obj):
-        """Return count of active courses in this category."""
-        return obj.get_active_courses_count()
 
 
 class CategoryListSerializer(serializers.ModelSerializer):
@@ -52,11 +50,14 @@ class CourseSerializer(serializers.ModelSerializer):
         read_only=True
     )
     
-    # Statistics
-    enrollment_count = serializers.SerializerMethodField()
-    active_enrollment_count = serializers.SerializerMethodField()
-    completion_count = serializers.SerializerMethodField()
-    completion_rate = serializers.SerializerMethodField()
+    # Statistics (read from queryset annotations when available)
+    enrollment_count = serializers.IntegerField(source='get_enrollment_count', read_only=True)
+    active_enrollment_count = serializers.IntegerField(
+        source='get_active_enrollment_count',
+        read_only=True
+    )
+    completion_count = serializers.IntegerField(source='get_completion_count', read_only=True)
+    completion_rate = serializers.FloatField(source='get_completion_rate', read_only=True)
     
     class Meta:
         model = Course
@@ -75,34 +76,19 @@ class CourseSerializer(serializers.ModelSerializer):
             'completion_count', 'completion_rate'
         ]
     
-    def get_enrollment_count(self, obj):
-        """Return total enrollment count."""
-        return obj.get_enrollment_count()
-    
-    def get_active_enrollment_count(self, obj):
-        """Return active enrollment count."""
-        return obj.get_active_enrollment_count()
-    
-    def get_completion_count(self, obj):
-        """Return completion count."""
-        return obj.get_completion_count()
-    
-    def get_completion_rate(self, obj):
-        """Return completion rate percentage."""
-        return obj.get_completion_rate()
-    
     def validate_prerequisites(self, value):
         """Validate prerequisites to prevent circular dependencies."""
         instance = self.instance
         if instance:
             # Check for circular dependencies
+            dependents = instance.get_dependent_ids()
             for prereq in value:
                 if prereq.id == instance.id:
                     raise serializers.ValidationError(
                         "A course cannot be its own prerequisite."
                     )
-                # Check if this course is already a prerequisite of the prereq
-                if instance.is_prerequisite_for(prereq):
+                # Check if the prereq already depends on this course
+                if prereq.id in dependents:
                     raise serializers.ValidationError(
                         f"Circular dependency: '{prereq.title}' already has "
                         f"'{instance.title}' as a prerequisite."
@@ -125,9 +111,9 @@ class CourseSerializer(serializers.ModelSerializer):
 class CourseListSerializer(serializers.ModelSerializer):
     """Simplified serializer for course listing."""
     
-    category_name = serializers.CharField(source='category.name', read_only=True)
-    prerequisite_count = serializers.SerializerMethodField()
-    enrollment_count = serializers.SerializerMethodField()
+    category_name = serializers.CharField(source='get_category_name', read_only=True)
+    prerequisite_count = serializers.IntegerField(source='get_prerequisite_count', read_only=True)
+    enrollment_count = serializers.IntegerField(source='get_enrollment_count', read_only=True)
     
     class Meta:
         model = Course
@@ -136,14 +122,6 @@ class CourseListSerializer(serializers.ModelSerializer):
             'category', 'category_name', 'prerequisite_count',
             'enrollment_count', 'is_active', 'created_at'
         ]
-    
-    def get_prerequisite_count(self, obj):
-        """Return number of prerequisites."""
-        return obj.prerequisites.count()
-    
-    def get_enrollment_count(self, obj):
-        """Return enrollment count."""
-        return obj.get_enrollment_count()
 
 
 class CourseCreateUpdateSerializer(serializers.ModelSerializer):
@@ -160,12 +138,13 @@ class CourseCreateUpdateSerializer(serializers.ModelSerializer):
         """Validate prerequisites."""
         instance = self.instance
         if instance:
+            dependents = instance.get_dependent_ids()
             for prereq in value:
                 if prereq.id == instance.id:
                     raise serializers.ValidationError(
                         "A course cannot be its own prerequisite."
                     )
-                if instance.is_prerequisite_for(prereq):
+                if prereq.id in dependents:
                     raise serializers.ValidationError(
                         f"Circular dependency detected with '{prereq.title}'."
                     )
@@ -183,9 +162,13 @@ class CourseCreateUpdateSerializer(serializers.ModelSerializer):
         """Update course with prerequisites."""
         prerequisites = validated_data.pop('prerequisites', None)
         
+        changed = []
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
-        instance.save()
+            changed.append(attr)
+        if changed:
+            # Only write the submitted columns (plus the auto_now timestamp)
+            instance.save(update_fields=changed + ['updated_at'])
         
         if prerequisites is not None:
             instance.prerequisites.set(prerequisites)
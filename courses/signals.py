@@ -0,0 +1,39 @@
+# courses app
+"""
+Signals for keeping cached course data fresh.
+"""
+
+from django.conf import settings
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from enrollments.models import Enrollment
+from .models import Category, Course
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+@receiver(post_save, sender=Enrollment)
+@receiver(post_delete, sender=Enrollment)
+def invalidate_statistics_cache(sender, instance, **kwargs):
+    """
+    Invalidate the cached course statistics whenever a category, course
+    or enrollment changes.
+    """
+    Course.invalidate_statistics_cache()
+
+
+# User columns shown or filtered on in the cached statistics payloads
+USER_STATISTICS_FIELDS = {'first_name', 'last_name', 'role'}
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_statistics_cache_for_user(sender, instance, update_fields=None, **kwargs):
+    """
+    Invalidate the cached statistics when a user's name or role may have
+    changed; saves of other fields only (e.g. last_login) are ignored.
+    """
+    if update_fields is not None and not USER_STATISTICS_FIELDS & set(update_fields):
+        return
+    Course.invalidate_statistics_cache()
\ No newline at end of file
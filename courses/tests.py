@@ -1,7 +1,14 @@
+from datetime import date
+from django.db import IntegrityError, transaction
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from decimal import Decimal
+from django.utils import timezone
+from rest_framework.test import APIClient
+from enrollments.models import Enrollment
+from .mixins import serializer_query_plan
 from .models import Category, Course
+from .serializers import CourseCreateUpdateSerializer, CourseListSerializer, CourseSerializer
 
 User = get_user_model()
 
@@ -125,6 +132,53 @@ class CourseModelTest(TestCase):
         self.assertTrue(self.course.is_prerequisite_for(advanced_course))
         self.assertEqual(advanced_course.prerequisites.count(), 1)
     
+    def test_partial_update_saves_only_submitted_fields(self):
+        """Test partial updates leave other columns untouched."""
+        # Simulate a concurrent change the serializer's instance doesn't know about
+        Course.objects.filter(pk=self.course.pk).update(duration=99)
+        serializer = CourseCreateUpdateSerializer(
+            self.course, data={'title': 'Python Basics'}, partial=True
+        )
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        serializer.save()
+        
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.title, 'Python Basics')
+        self.assertEqual(self.course.duration, 99)
+    
+    def test_price_and_duration_constraints(self):
+        """Test the database rejects negative prices and zero durations."""
+        for field, value in (('price', Decimal('-1.00')), ('duration', 0)):
+            with self.subTest(field=field), transaction.atomic():
+                with self.assertRaises(IntegrityError):
+                    Course.objects.filter(pk=self.course.pk).update(**{field: value})
+    
+    def test_get_dependent_ids_is_transitive(self):
+        """Test dependent ids include indirect dependents."""
+        middle = Course.objects.create(
+            title='Intermediate Python',
+            description='Intermediate concepts',
+            duration=50,
+            price=Decimal('12000.00'),
+            level='INTERMEDIATE',
+            category=self.category,
+            created_by=self.user
+        )
+        top = Course.objects.create(
+            title='Expert Python',
+            description='Expert concepts',
+            duration=70,
+            price=Decimal('20000.00'),
+            level='ADVANCED',
+            category=self.category,
+            created_by=self.user
+        )
+        middle.prerequisites.add(self.course)
+        top.prerequisites.add(middle)
+        
+        self.assertEqual(self.course.get_dependent_ids(), {middle.id, top.id})
+        self.assertEqual(top.get_dependent_ids(), set())
+    
     def test_get_prerequisite_titles(self):
         """Test getting list of prerequisite titles."""
         prereq1 = Course.objects.create(
@@ -158,4 +212,178 @@ class CourseModelTest(TestCase):
         self.assertEqual(self.course.get_enrollment_count(), 0)
         self.assertEqual(self.course.get_active_enrollment_count(), 0)
         self.assertEqual(self.course.get_completion_count(), 0)
-        self.assertEqual(self.course.get_completion_rate(), 0)
\ No newline at end of file
+        self.assertEqual(self.course.get_completion_rate(), 0)
+
+class CourseStatisticsAPITest(TestCase):
+    """Test cases for the course statistics endpoint."""
+    
+    def setUp(self):
+        """Set up courses with a mix of enrollments."""
+        self.admin = User.objects.create_user(
+            username='admin',
+            email='admin@test.com',
+            password='testpass123',
+            first_name='Admin',
+            last_name='User',
+            role='ADMIN'
+        )
+        self.category = Category.objects.create(name='Programming')
+        
+        self.python = Course.objects.create(
+            title='Python',
+            description='Learn Python',
+            duration=40,
+            price=Decimal('100.00'),
+            level='BEGINNER',
+            category=self.category,
+            created_by=self.admin
+        )
+        self.django = Course.objects.create(
+            title='Django',
+            description='Learn Django',
+            duration=60,
+            price=Decimal('200.00'),
+            level='ADVANCED',
+            created_by=self.admin,
+            is_active=False
+        )
+        
+        students = [
+            User.objects.create_user(
+                username=f'student{i}',
+                email=f'student{i}@test.com',
+                password='testpass123',
+                first_name='Student',
+                last_name=str(i),
+                role='STUDENT'
+            )
+            for i in range(4)
+        ]
+        # First student completed, the rest still in progress
+        Enrollment.objects.bulk_create([
+            Enrollment(
+                student=student,
+                course=self.python,
+                enrollment_date=date(2025, 1, 1),
+                status='COMPLETED' if i == 0 else 'IN_PROGRESS',
+                completion_date=date(2025, 2, 1) if i == 0 else None
+            )
+            for i, student in enumerate(students)
+        ])
+        
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+    
+    def test_statistics(self):
+        """Test aggregated course statistics."""
+        response = self.client.get('/api/courses/admin/courses/statistics/')
+        self.assertEqual(response.status_code, 200)
+        
+        data = response.json()
+        self.assertEqual(data['total_courses'], 2)
+        self.assertEqual(data['active_courses'], 1)
+        self.assertEqual(data['inactive_courses'], 1)
+        self.assertEqual(data['total_enrollments'], 4)
+        self.assertEqual(data['courses_by_level'], {'BEGINNER': 1, 'ADVANCED': 1})
+        self.assertEqual(data['courses_by_category'], {'Programming': 1})
+        self.assertEqual(data['avg_completion_rate'], 25.0)
+        self.assertEqual(data['top_enrolled_courses'][0]['id'], self.python.id)
+        self.assertEqual(data['top_enrolled_courses'][0]['enrollment_count'], 4)
+    
+    def test_statistics_cache_invalidated_on_change(self):
+        """Test cached statistics refresh after a course is added."""
+        url = '/api/courses/admin/courses/statistics/'
+        self.assertEqual(self.client.get(url).json()['total_courses'], 2)
+        
+        Course.objects.create(
+            title='Flask',
+            description='Learn Flask',
+            duration=30,
+            price=Decimal('150.00'),
+            level='INTERMEDIATE',
+            category=self.category,
+            created_by=self.admin
+        )
+        self.assertEqual(self.client.get(url).json()['total_courses'], 3)
+
+
+class CourseListFilterAPITest(TestCase):
+    """Test cases for the course list range filters."""
+    
+    def setUp(self):
+        """Set up courses with different prices."""
+        self.admin = User.objects.create_user(
+            username='admin',
+            email='admin@test.com',
+            password='testpass123',
+            role='ADMIN'
+        )
+        for title, price in (('Cheap', '50.00'), ('Pricey', '500.00')):
+            Course.objects.create(
+                title=title,
+                description=title,
+                duration=10,
+                price=Decimal(price),
+                level='BEGINNER',
+                created_by=self.admin
+            )
+        
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+    
+    def test_price_range_filter(self):
+        """Test courses are filtered by a parsed price bound."""
+        response = self.client.get('/api/courses/admin/courses/', {'min_price': '100'})
+        self.assertEqual(response.status_code, 200)
+        
+        data = response.json()
+        results = data['results'] if isinstance(data, dict) else data
+        self.assertEqual([c['title'] for c in results], ['Pricey'])
+    
+    def test_list_counts_are_not_multiplied(self):
+        """Test enrollment and prerequisite counts do not multiply each other."""
+        cheap = Course.objects.get(title='Cheap')
+        pricey = Course.objects.get(title='Pricey')
+        extra = Course.objects.create(
+            title='Extra', description='Extra', duration=10,
+            price=Decimal('10.00'), level='BEGINNER', created_by=self.admin
+        )
+        pricey.prerequisites.set([cheap, extra])
+        for i in range(3):
+            student = User.objects.create_user(
+                username=f'student{i}', email=f'student{i}@test.com',
+                password='testpass123', role='STUDENT'
+            )
+            Enrollment.objects.create(
+                student=student, course=pricey, enrollment_date=timezone.now().date()
+            )
+        
+        response = self.client.get('/api/courses/admin/courses/', {'min_price': '100'})
+        data = response.json()
+        row = (data['results'] if isinstance(data, dict) else data)[0]
+        self.assertEqual(row['prerequisite_count'], 2)
+        self.assertEqual(row['enrollment_count'], 3)
+        
+        response = self.client.get(f'/api/courses/admin/courses/{pricey.id}/')
+        self.assertEqual(response.json()['enrollment_count'], 3)
+    
+    def test_invalid_range_value(self):
+        """Test malformed range bounds are rejected with 400."""
+        for params in ({'min_price': 'abc'}, {'max_price': 'NaN'}, {'min_duration': '1.5'}):
+            with self.subTest(params=params):
+                response = self.client.get('/api/courses/admin/courses/', params)
+                self.assertEqual(response.status_code, 400)
+
+
+class SerializerQueryPlanTest(TestCase):
+    """Test cases for serializer-driven select/prefetch planning."""
+    
+    def test_detail_serializer_plan(self):
+        """Test nested and dotted fields produce joins and prefetches."""
+        select_related, prefetches = serializer_query_plan(CourseSerializer)
+        self.assertEqual(select_related, ('category', 'created_by'))
+        self.assertEqual([p.prefetch_through for p in prefetches], ['prerequisites'])
+    
+    def test_list_serializer_plan(self):
+        """Test pk-only relations do not add joins."""
+        self.assertEqual(serializer_query_plan(CourseListSerializer), ((), ()))
@@ -1,14 +1,14 @@
 # courses app
 from django.urls import path, include
-from rest_framework.routers import DefaultRouter
+from rest_framework.routers import SimpleRouter
 from .views import CategoryViewSet, CourseViewSet, PublicCourseViewSet
 
 # Create routers
-admin_router = DefaultRouter()
+admin_router = SimpleRouter()
 admin_router.register(r'categories', CategoryViewSet, basename='category')
 admin_router.register(r'courses', CourseViewSet, basename='course')
 
-public_router = DefaultRouter()
+public_router = SimpleRouter()
 public_router.register(r'courses', PublicCourseViewSet, basename='public-course')
 
 app_name = 'courses'
@@ -1,10 +1,17 @@
 # courses app
+from decimal import Decimal, InvalidOperation
 from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Count, Q, Avg
+from django.core.cache import cache
+from django.db.models import (
+    Count, Q, Avg, F, Sum, ExpressionWrapper, FloatField, OuterRef, Subquery
+)
+from django.db.models.functions import Coalesce
+from .mixins import SerializerDrivenPrefetchMixin
 from .models import Category, Course
 from .serializers import (
     CategorySerializer, CategoryListSerializer,
@@ -15,6 +22,26 @@ from .serializers import (
 from .permissions import IsAdminOrAcademic, IsAdminOrReadOnly
 
 
+STATISTICS_CACHE_TIMEOUT = 300
+
+
+def _to_decimal(value):
+    """Parse a finite Decimal from a query parameter."""
+    number = Decimal(value)
+    if not number.is_finite():
+        raise InvalidOperation(value)
+    return number
+
+
+# (query param, lookup, parser) for the course list range filters
+RANGE_FILTERS = (
+    ('min_price', 'price__gte', _to_decimal),
+    ('max_price', 'price__lte', _to_decimal),
+    ('min_duration', 'duration__gte', int),
+    ('max_duration', 'duration__lte', int),
+)
+
+
 class CategoryViewSet(viewsets.ModelViewSet):
     """ViewSet for managing course categories."""
     
@@ -31,7 +58,11 @@ class CategoryViewSet(viewsets.ModelViewSet):
         return CategorySerializer
     
     def get_queryset(self):
-        queryset = Category.objects.all()
+        queryset = Category.objects.annotate(
+            active_courses=Count(
+                'courses', filter=Q(courses__is_active=True), distinct=True
+            )
+        )
         
         # Filter by active status
         is_active = self.request.query_params.get('is_active', None)
@@ -49,10 +80,10 @@ class CategoryViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class CourseViewSet(viewsets.ModelViewSet):
+class CourseViewSet(SerializerDrivenPrefetchMixin, viewsets.ModelViewSet):
     """ViewSet for managing courses."""
     
-    queryset = Course.objects.select_related('category', 'created_by').prefetch_related('prerequisites')
+    queryset = Course.objects.all()
     permission_classes = [IsAdminOrAcademic]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['level', 'category', 'is_active']
@@ -68,25 +99,42 @@ class CourseViewSet(viewsets.ModelViewSet):
         return CourseSerializer
     
     def get_queryset(self):
-        queryset = Course.objects.select_related('category', 'created_by').prefetch_related('prerequisites')
-        
-        # Filter by price range
-        min_price = self.request.query_params.get('min_price', None)
-        max_price = self.request.query_params.get('max_price', None)
-        
-        if min_price:
-            queryset = queryset.filter(price__gte=min_price)
-        if max_price:
-            queryset = queryset.filter(price__lte=max_price)
+        # Joins and prefetches come from the active serializer's fields
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            # CourseListSerializer only needs the category name, not the
+            # related Category instance
+            queryset = queryset.annotate(category_name=F('category__name'))
         
-        # Filter by duration range
-        min_duration = self.request.query_params.get('min_duration', None)
-        max_duration = self.request.query_params.get('max_duration', None)
+        if self.action in ('list', 'retrieve'):
+            # Only the read serializers show these counts. Prerequisites are
+            # counted in a subquery so they are not multiplied by the
+            # enrollments join; the model helpers query on demand elsewhere.
+            prerequisites = Course.prerequisites.through.objects.filter(
+                from_course=OuterRef('pk')
+            ).order_by().values('from_course').annotate(total=Count('pk')).values('total')
+            queryset = queryset.annotate(
+                enrollment_count=Count('enrollments'),
+                active_enrollment_count=Count(
+                    'enrollments',
+                    filter=Q(enrollments__status='IN_PROGRESS')
+                ),
+                completion_count=Count(
+                    'enrollments',
+                    filter=Q(enrollments__status='COMPLETED')
+                ),
+                prerequisite_count=Coalesce(Subquery(prerequisites), 0)
+            )
         
-        if min_duration:
-            queryset = queryset.filter(duration__gte=min_duration)
-        if max_duration:
-            queryset = queryset.filter(duration__lte=max_duration)
+        # Filter by price and duration ranges, parsing each bound once
+        for param, lookup, cast in RANGE_FILTERS:
+            value = self.request.query_params.get(param, None)
+            if value:
+                try:
+                    value = cast(value)
+                except (InvalidOperation, ValueError):
+                    raise ValidationError({param: f"Invalid value '{value}'."})
+                queryset = queryset.filter(**{lookup: value})
         
         return queryset
     
@@ -98,25 +146,36 @@ class CourseViewSet(viewsets.ModelViewSet):
     def enrollments(self, request, pk=None):
         """Get all enrollments for a specific course."""
         course = self.get_object()
-        enrollments = course.enrollments.select_related('student').all()
+        rows = course.enrollments.values(
+            'id', 'status', 'enrollment_date', 'completion_date',
+            'student__first_name', 'student__last_name', 'student__email'
+        )
+        
+        # Status breakdown in a single query
+        stats = course.enrollments.aggregate(
+            total=Count('id'),
+            in_progress=Count('id', filter=Q(status='IN_PROGRESS')),
+            completed=Count('id', filter=Q(status='COMPLETED')),
+            cancelled=Count('id', filter=Q(status='CANCELLED'))
+        )
         
         # Simple enrollment data
         data = {
             'course': course.title,
-            'total_enrollments': enrollments.count(),
-            'in_progress': enrollments.filter(status='IN_PROGRESS').count(),
-            'completed': enrollments.filter(status='COMPLETED').count(),
-            'cancelled': enrollments.filter(status='CANCELLED').count(),
+            'total_enrollments': stats['total'],
+            'in_progress': stats['in_progress'],
+            'completed': stats['completed'],
+            'cancelled': stats['cancelled'],
             'enrollments': [
                 {
-                    'id': e.id,
-                    'student_name': e.student.get_full_name(),
-                    'student_email': e.student.email,
-                    'enrollment_date': e.enrollment_date,
-                    'status': e.status,
-                    'completion_date': e.completion_date
+                    'id': r['id'],
+                    'student_name': f"{r['student__first_name']} {r['student__last_name']}".strip(),
+                    'student_email': r['student__email'],
+                    'enrollment_date': r['enrollment_date'],
+                    'status': r['status'],
+                    'completion_date': r['completion_date']
                 }
-                for e in enrollments
+                for r in rows
             ]
         }
         return Response(data)
@@ -124,15 +183,40 @@ class CourseViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def statistics(self, request):
         """Get comprehensive course statistics."""
-        courses = Course.objects.all()
+        data = cache.get_or_set(
+            Course.statistics_cache_key(),
+            self._build_statistics,
+            STATISTICS_CACHE_TIMEOUT
+        )
+        return Response(data)
+    
+    def _build_statistics(self):
+        """Compute the statistics payload."""
+        courses = Course.objects.order_by()
         
         # Basic counts
-        total_courses = courses.count()
-        active_courses = courses.filter(is_active=True).count()
+        counts = courses.aggregate(
+            total=Count('id'),
+            active=Count('id', filter=Q(is_active=True))
+        )
+        total_courses = counts['total']
+        active_courses = counts['active']
         inactive_courses = total_courses - active_courses
         
+        # Per-course enrollment counts, computed in one GROUP BY
+        courses_with_counts = courses.annotate(
+            enrollment_count=Count('enrollments', distinct=True),
+            completed_count=Count(
+                'enrollments',
+                filter=Q(enrollments__status='COMPLETED'),
+                distinct=True
+            )
+        )
+        
         # Enrollments count
-        total_enrollments = sum(course.get_enrollment_count() for course in courses)
+        total_enrollments = courses_with_counts.aggregate(
+            total=Sum('enrollment_count')
+        )['total'] or 0
         
         # Courses by level
         courses_by_level = dict(
@@ -140,24 +224,30 @@ class CourseViewSet(viewsets.ModelViewSet):
         )
         
         # Courses by category
-        courses_by_category = {}
-        for course in courses.select_related('category'):
-            if course.category:
-                cat_name = course.category.name
-                courses_by_category[cat_name] = courses_by_category.get(cat_name, 0) + 1
+        courses_by_category = dict(
+            courses.filter(category__isnull=False).values('category__name').annotate(
+                count=Count('id')
+            ).values_list('category__name', 'count')
+        )
         
-        # Average completion rate
-        completion_rates = [course.get_completion_rate() for course in courses if course.get_enrollment_count() > 0]
-        avg_completion_rate = sum(completion_rates) / len(completion_rates) if completion_rates else 0
+        # Average completion rate (over courses that have enrollments)
+        avg_completion_rate = courses_with_counts.filter(enrollment_count__gt=0).annotate(
+            completion_rate=ExpressionWrapper(
+                100.0 * F('completed_count') / F('enrollment_count'),
+                output_field=FloatField()
+            )
+        ).aggregate(avg=Avg('completion_rate'))['avg'] or 0
         
         # Top enrolled courses
         top_enrolled = [
             {
-                'id': course.id,
-                'title': course.title,
-                'enrollment_count': course.get_enrollment_count()
+                'id': course['id'],
+                'title': course['title'],
+                'enrollment_count': course['enrollment_count']
             }
-            for course in sorted(courses, key=lambda c: c.get_enrollment_count(), reverse=True)[:5]
+            for course in courses_with_counts.order_by('-enrollment_count', '-created_at').values(
+                'id', 'title', 'enrollment_count'
+            )[:5]
         ]
         
         data = {
@@ -171,8 +261,7 @@ class CourseViewSet(viewsets.ModelViewSet):
             'top_enrolled_courses': top_enrolled
         }
         
-        serializer = CourseStatisticsSerializer(data)
-        return Response(serializer.data)
+        return dict(CourseStatisticsSerializer(data).data)
     
     @action(detail=True, methods=['post'])
     def toggle_active(self, request, pk=None):
@@ -188,10 +277,13 @@ class CourseViewSet(viewsets.ModelViewSet):
         })
 
 
-class PublicCourseViewSet(viewsets.ReadOnlyModelViewSet):
+class PublicCourseViewSet(SerializerDrivenPrefetchMixin, viewsets.ReadOnlyModelViewSet):
     """Public-facing course catalog (read-only)."""
     
-    queryset = Course.objects.filter(is_active=True).select_related('category').prefetch_related('prerequisites')
+    queryset = Course.objects.filter(is_active=True).only(
+        'id', 'title', 'description', 'duration', 'price', 'level',
+        'category__name'
+    )
     serializer_class = PublicCourseSerializer
     permission_classes = [AllowAny]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
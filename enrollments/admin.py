@@ -1,8 +1,28 @@
 from django.contrib import admin
+from django.utils import timezone
 from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+from courses.models import Course
 from .models import Enrollment
 
 
+# Status badges are constants, so build them once instead of per row
+BADGE_TEMPLATE = (
+    '<span style="background-color: {}; color: white; '
+    'padding: 3px 10px; border-radius: 3px;">{}</span>'
+)
+
+STATUS_COLORS = {
+    'IN_PROGRESS': '#FFA500',
+    'COMPLETED': '#28A745',
+    'CANCELLED': '#DC3545'
+}
+STATUS_BADGES = {
+    status: mark_safe(BADGE_TEMPLATE.format(STATUS_COLORS.get(status, '#6C757D'), label))
+    for status, label in Enrollment.STATUS_CHOICES
+}
+
+
 @admin.register(Enrollment)
 class EnrollmentAdmin(admin.ModelAdmin):
     """Admin interface for Enrollment model."""
@@ -52,16 +72,10 @@ class EnrollmentAdmin(admin.ModelAdmin):
     
     def status_badge(self, obj):
         """Display status with color badge."""
-        colors = {
-            'IN_PROGRESS': '#FFA500',
-            'COMPLETED': '#28A745',
-            'CANCELLED': '#DC3545'
-        }
-        return format_html(
-            '<span style="background-color: {}; color: white; padding: 3px 10px; border-radius: 3px;">{}</span>',
-            colors.get(obj.status, '#6C757D'),
-            obj.get_status_display()
-        )
+        badge = STATUS_BADGES.get(obj.status)
+        if badge is None:
+            badge = format_html(BADGE_TEMPLATE, '#6C757D', obj.get_status_display())
+        return badge
     status_badge.short_description = 'Status'
     status_badge.admin_order_field = 'status'
     
@@ -88,29 +102,42 @@ class EnrollmentAdmin(admin.ModelAdmin):
     payment_summary_display.short_description = 'Payment Summary'
     
     def get_queryset(self, request):
-        """Optimize queryset with select_related."""
+        """Optimize queryset with select_related and prefetched payments."""
         queryset = super().get_queryset(request)
-        return queryset.select_related('student', 'course', 'verified_by')
+        return queryset.select_related(
+            'student', 'course', 'verified_by'
+        ).prefetch_related('payments')
     
     actions = ['mark_completed', 'mark_cancelled']
     
     def mark_completed(self, request, queryset):
         """Mark selected enrollments as completed."""
-        from django.utils import timezone
-        count = 0
-        for enrollment in queryset:
-            if enrollment.status == 'IN_PROGRESS':
-                enrollment.status = 'COMPLETED'
-                enrollment.completion_date = timezone.now().date()
-                enrollment.verified_by = request.user
-                enrollment.save()
-                count += 1
+        now = timezone.now()
+        # update() skips clean_dates(), so leave out rows whose enrollment
+        # date is after today; completing them would break its date rule
+        count = queryset.filter(
+            status='IN_PROGRESS',
+            enrollment_date__lte=now.date()
+        ).update(
+            status='COMPLETED',
+            completion_date=now.date(),
+            verified_by=request.user,
+            updated_at=now
+        )
+        if count:
+            # update() skips post_save, so refresh cached course statistics here
+            Course.invalidate_statistics_cache()
         
         self.message_user(request, f'{count} enrollment(s) marked as completed.')
     mark_completed.short_description = 'Mark selected as completed'
     
     def mark_cancelled(self, request, queryset):
         """Mark selected enrollments as cancelled."""
-        count = queryset.filter(status='IN_PROGRESS').update(status='CANCELLED')
+        count = queryset.filter(status='IN_PROGRESS').update(
+            status='CANCELLED',
+            updated_at=timezone.now()
+        )
+        if count:
+            Course.invalidate_statistics_cache()
         self.message_user(request, f'{count} enrollment(s) marked as cancelled.')
     mark_cancelled.short_description = 'Mark selected as cancelled'
\ No newline at end of file
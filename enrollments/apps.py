@@ -10,6 +10,4 @@ class EnrollmentsConfig(AppConfig):
     
     def ready(self):
         """Import signals when app is ready."""
-        # Import signals here if you create any
-        # import enrollments.signals
-        pass
\ No newline at end of file
+        import enrollments.signals
\ No newline at end of file
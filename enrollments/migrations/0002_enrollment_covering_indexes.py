@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-15 23:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0003_course_price_duration_constraints'),
+        ('enrollments', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='enrollment',
+            name='enrollments_student_885f1d_idx',
+        ),
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['student', 'status', 'course'], name='enr_student_status_course'),
+        ),
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(condition=models.Q(('status', 'CANCELLED'), _negated=True), fields=['student', 'course'], name='enr_active_unique_lookup'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-15 23:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0003_course_price_duration_constraints'),
+        ('enrollments', '0002_enrollment_covering_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['status', 'enrollment_date'], name='enr_status_date'),
+        ),
+    ]
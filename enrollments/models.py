@@ -1,8 +1,71 @@
 # enrollment
-from django.db import models
+import hashlib
+from decimal import Decimal
+from urllib.parse import urlencode
+from django.db import models, transaction
+from django.db.models import (
+    Avg, CharField, Count, DecimalField, DurationField, ExpressionWrapper, F,
+    Q, Sum, Value
+)
+from django.db.models.functions import Coalesce, Concat, Trim
 from django.conf import settings
+from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 from django.utils import timezone
+from courses.models import Course
+
+
+class EnrollmentQuerySet(models.QuerySet):
+    """QuerySet for Enrollment with shared annotation helpers."""
+    
+    def with_payment_totals(self):
+        """Annotate each enrollment with its total paid and payment count."""
+        return self.annotate(
+            _total_paid=Coalesce(
+                Sum('payments__amount'),
+                Value(Decimal('0')),
+                output_field=DecimalField(max_digits=10, decimal_places=2)
+            ),
+            _payment_count=Count('payments')
+        )
+    
+    def with_duration_days(self):
+        """
+        Annotate each enrollment with its duration as ``_duration``, measured
+        to the completion date or, for open enrollments, to today.
+        """
+        today = timezone.now().date()
+        return self.annotate(
+            _duration=ExpressionWrapper(
+                Coalesce(F('completion_date'), Value(today)) - F('enrollment_date'),
+                output_field=DurationField()
+            )
+        )
+    
+    def with_student_name(self):
+        """Annotate each enrollment with the student's full name as ``_student_name``."""
+        return self.annotate(
+            _student_name=Trim(Concat(
+                'student__first_name', Value(' '), 'student__last_name',
+                output_field=CharField()
+            ))
+        )
+    
+    def statistics(self):
+        """
+        Return status counts and the average completion time in one query.
+        ``avg_completion`` is a timedelta, or None without completed rows.
+        """
+        return self.order_by().aggregate(
+            total=Count('id'),
+            active=Count('id', filter=Q(status='IN_PROGRESS')),
+            completed=Count('id', filter=Q(status='COMPLETED')),
+            cancelled=Count('id', filter=Q(status='CANCELLED')),
+            avg_completion=Avg(
+                F('completion_date') - F('enrollment_date'),
+                filter=Q(status='COMPLETED', completion_date__isnull=False)
+            )
+        )
 
 
 class Enrollment(models.Model):
@@ -14,6 +77,19 @@ class Enrollment(models.Model):
         ('CANCELLED', 'Cancelled'),
     ]
     
+    # Statuses an enrollment may move to from each status
+    ALLOWED_TRANSITIONS = {
+        'IN_PROGRESS': frozenset(('IN_PROGRESS', 'COMPLETED', 'CANCELLED')),
+        'COMPLETED': frozenset(('COMPLETED',)),
+        'CANCELLED': frozenset(('CANCELLED',)),
+    }
+    TRANSITION_ERRORS = {
+        ('COMPLETED', 'IN_PROGRESS'): 'Cannot change status of a completed enrollment.',
+        ('COMPLETED', 'CANCELLED'): 'Cannot cancel a completed enrollment.',
+        ('CANCELLED', 'IN_PROGRESS'): 'Cannot reopen a cancelled enrollment.',
+        ('CANCELLED', 'COMPLETED'): 'Cannot complete a cancelled enrollment.',
+    }
+    
     # Relations
     student = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -54,6 +130,8 @@ class Enrollment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = EnrollmentQuerySet.as_manager()
+    
     class Meta:
         db_table = 'enrollments_enrollment'
         verbose_name = 'Enrollment'
@@ -61,14 +139,111 @@ class Enrollment(models.Model):
         ordering = ['-enrollment_date']
         unique_together = ['student', 'course']
         indexes = [
-            models.Index(fields=['student', 'status']),
+            # course_id as a trailing key column covers the completed-courses
+            # lookup (student + status -> course_id) on every backend
+            models.Index(
+                fields=['student', 'status', 'course'],
+                name='enr_student_status_course'
+            ),
             models.Index(fields=['course', 'status']),
             models.Index(fields=['enrollment_date']),
+            # Status-filtered lists ordered by date (pending completion)
+            models.Index(
+                fields=['status', 'enrollment_date'],
+                name='enr_status_date'
+            ),
+            # Duplicate-enrollment check ignores cancelled rows
+            models.Index(
+                fields=['student', 'course'],
+                condition=~models.Q(status='CANCELLED'),
+                name='enr_active_unique_lookup'
+            ),
         ]
     
     def __str__(self):
         return f"{self.student.get_full_name()} - {self.course.title} ({self.status})"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember the loaded status so changes can be detected without a refetch."""
+        instance = super().from_db(db, field_names, values)
+        if 'status' in field_names:
+            instance._loaded_status = instance.status
+        return instance
+    
+    @classmethod
+    def validate_bulk(cls, rows):
+        """
+        Validate enrollment rows for bulk_enroll() without saving them.
+        Each row is a dict of field values using ``student_id``/``course_id``.
+        Returns ``(valid_rows, errors)`` where errors are ``(index, message)``.
+        """
+        rows = list(rows)
+        student_ids = {row['student_id'] for row in rows}
+        course_ids = {row['course_id'] for row in rows}
+        
+        students = set(get_user_model().objects.filter(
+            id__in=student_ids, role='STUDENT'
+        ).order_by().values_list('id', flat=True))
+        courses = set(Course.objects.filter(
+            id__in=course_ids
+        ).order_by().values_list('id', flat=True))
+        # unique_together covers cancelled rows too, so any existing pair clashes
+        existing = set(cls.objects.filter(
+            student_id__in=student_ids, course_id__in=course_ids
+        ).order_by().values_list('student_id', 'course_id'))
+        
+        valid_rows, errors = [], []
+        for index, row in enumerate(rows):
+            pair = (row['student_id'], row['course_id'])
+            if row['student_id'] not in students:
+                errors.append((index, 'Only users with STUDENT role can be enrolled.'))
+                continue
+            if row['course_id'] not in courses:
+                errors.append((index, f"Course {row['course_id']} does not exist."))
+                continue
+            if pair in existing:
+                errors.append((index, 'Student is already enrolled in this course.'))
+                continue
+            
+            # Same date rules as save(); bulk_create skips them
+            try:
+                cls(**row).clean_dates()
+            except ValidationError as e:
+                errors.append((index, ' '.join(e.messages)))
+                continue
+            
+            existing.add(pair)
+            valid_rows.append(row)
+        
+        return valid_rows, errors
+    
+    @classmethod
+    def bulk_enroll(cls, rows, batch_size=None):
+        """
+        Create many enrollments with bulk_create after validate_bulk().
+        save(), clean() and model signals do not run for these rows.
+        Returns ``(created, errors)``; ``created`` holds only inserted rows.
+        """
+        if batch_size is None:
+            batch_size = settings.ENROLLMENT_BULK_BATCH_SIZE
+        
+        valid_rows, errors = cls.validate_bulk(rows)
+        # validate_bulk() already drops existing pairs; a pair claimed by a
+        # concurrent insert raises IntegrityError and rolls the batch back
+        # rather than being skipped and still counted as created
+        with transaction.atomic():
+            created = cls.objects.bulk_create(
+                [cls(**row) for row in valid_rows],
+                batch_size=batch_size
+            )
+        
+        if created:
+            # No post_save signals fire, so refresh cached course statistics here
+            Course.invalidate_statistics_cache()
+        
+        return created, errors
+    
     def clean(self):
         """Validate enrollment business rules."""
         # Check if student role is correct
@@ -89,7 +264,10 @@ class Enrollment(models.Model):
                     'course': 'Student is already enrolled in this course.'
                 })
         
-        # Validate completion date
+        self.clean_dates()
+    
+    def clean_dates(self):
+        """Validate completion date rules."""
         if self.status == 'COMPLETED' and not self.completion_date:
             raise ValidationError({
                 'completion_date': 'Completion date is required for completed enrollments.'
@@ -100,48 +278,101 @@ class Enrollment(models.Model):
                 'completion_date': 'Completion date cannot be before enrollment date.'
             })
     
-    def save(self, *args, **kwargs):
-        """Override save to run validations."""
-        self.clean()
+    def save(self, *args, skip_clean=False, **kwargs):
+        """
+        Override save to run validations.
+        Pass skip_clean=True only when the caller has already run the same
+        checks (e.g. EnrollmentCreateSerializer.validate).
+        """
+        if not skip_clean:
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and not {'student', 'course'} & set(update_fields):
+                # Student/course untouched: skip the role and duplicate checks
+                self.clean_dates()
+            else:
+                self.clean()
         super().save(*args, **kwargs)
+        self._loaded_status = self.status
+        self.__dict__.pop('_payment_summary_cache', None)
+        self.__dict__.pop('_duration', None)
+    
+    def transition_error(self, new_status):
+        """Return why the status cannot change to new_status, or None if it can."""
+        if new_status in self.ALLOWED_TRANSITIONS[self.status]:
+            return None
+        return self.TRANSITION_ERRORS[(self.status, new_status)]
     
     def mark_completed(self, verified_by=None):
         """Mark enrollment as completed."""
         if self.status == 'COMPLETED':
             raise ValidationError('Enrollment is already completed.')
         
-        if self.status == 'CANCELLED':
-            raise ValidationError('Cannot complete a cancelled enrollment.')
+        error = self.transition_error('COMPLETED')
+        if error:
+            raise ValidationError(error)
         
         self.status = 'COMPLETED'
         self.completion_date = timezone.now().date()
         if verified_by:
             self.verified_by = verified_by
-        self.save()
+        self.save(update_fields=['status', 'completion_date', 'verified_by', 'updated_at'])
     
     def mark_cancelled(self):
         """Mark enrollment as cancelled."""
-        if self.status == 'COMPLETED':
-            raise ValidationError('Cannot cancel a completed enrollment.')
+        error = self.transition_error('CANCELLED')
+        if error:
+            raise ValidationError(error)
         
         self.status = 'CANCELLED'
-        self.save()
+        self.save(update_fields=['status', 'updated_at'])
+    
+    @staticmethod
+    def statistics_cache_key(params):
+        """
+        Return the statistics cache key for a set of filter parameters.
+        Shares the course statistics version, which every enrollment,
+        course and category change bumps.
+        """
+        signature = urlencode(sorted(params.lists()), doseq=True)
+        digest = hashlib.md5(signature.encode()).hexdigest()
+        return f"{Course.statistics_cache_key()}:enrollments:{digest}"
+    
+    def get_student_name(self):
+        """Return the student's full name, using the annotation if present."""
+        name = getattr(self, '_student_name', None)
+        if name is not None:
+            return name
+        return self.student.get_full_name()
     
     def get_payment_summary(self):
-        """Get payment summary for this enrollment."""
-        from payments.models import Payment
+        """Get payment summary for this enrollment (memoized until save())."""
+        cached = self.__dict__.get('_payment_summary_cache')
+        if cached is not None:
+            return cached
         
-        payments = Payment.objects.filter(enrollment=self)
-        total_paid = sum(p.amount for p in payments)
+        total_paid = getattr(self, '_total_paid', None)
+        if total_paid is not None:
+            # Annotated by EnrollmentQuerySet.with_payment_totals()
+            payment_count = self._payment_count
+        else:
+            if 'payments' in getattr(self, '_prefetched_objects_cache', {}):
+                amounts = [p.amount for p in self.payments.all()]
+            else:
+                # Only the amounts are needed, not whole Payment rows
+                amounts = list(self.payments.order_by().values_list('amount', flat=True))
+            total_paid = sum(amounts)
+            payment_count = len(amounts)
         outstanding = self.course.price - total_paid
         
-        return {
+        summary = {
             'course_price': self.course.price,
             'total_paid': total_paid,
             'outstanding_balance': max(outstanding, 0),
             'is_fully_paid': outstanding <= 0,
-            'payment_count': payments.count()
+            'payment_count': payment_count
         }
+        self._payment_summary_cache = summary
+        return summary
     
     def is_fully_paid(self):
         """Check if enrollment is fully paid."""
@@ -149,26 +380,33 @@ class Enrollment(models.Model):
     
     def check_prerequisites(self):
         """Check if student has completed all prerequisites."""
-        prerequisites = self.course.prerequisites.all()
-        
-        if not prerequisites.exists():
-            return True, []
-        
-        # Get completed courses by this student
-        completed_courses = Enrollment.objects.filter(
-            student=self.student,
-            status='COMPLETED'
-        ).values_list('course_id', flat=True)
-        
-        missing_prerequisites = []
-        for prereq in prerequisites:
-            if prereq.id not in completed_courses:
-                missing_prerequisites.append(prereq)
+        student_cached = self._meta.get_field('student').is_cached(self)
+        if student_cached and hasattr(self.student, '_completed_enrollments'):
+            # Completed courses and prerequisites were prefetched by the view
+            completed_courses = {e.course_id for e in self.student._completed_enrollments}
+            missing_prerequisites = [
+                prereq for prereq in self.course.prerequisites.all()
+                if prereq.id not in completed_courses
+            ]
+        else:
+            # Anti-join: only the prerequisites the student hasn't completed
+            completed_courses = Enrollment.objects.filter(
+                student_id=self.student_id,
+                status='COMPLETED'
+            ).values('course_id')
+            missing_prerequisites = list(
+                self.course.prerequisites.exclude(
+                    id__in=completed_courses
+                ).only('id', 'title')
+            )
         
         return len(missing_prerequisites) == 0, missing_prerequisites
     
     def get_duration_days(self):
         """Calculate enrollment duration in days."""
+        duration = getattr(self, '_duration', None)
+        if duration is not None:
+            return duration.days
         if self.completion_date:
             return (self.completion_date - self.enrollment_date).days
         return (timezone.now().date() - self.enrollment_date).days
\ No newline at end of file
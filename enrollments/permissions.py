@@ -1,6 +1,23 @@
 from rest_framework import permissions
 
 
+ADMIN_OR_REGISTRAR = frozenset(('ADMIN', 'REGISTRAR'))
+ADMIN_OR_ACADEMIC = frozenset(('ADMIN', 'ACADEMIC'))
+
+
+def _role(request):
+    """Return the authenticated user's role, resolved once per request."""
+    try:
+        return request._cached_role
+    except AttributeError:
+        pass
+    
+    user = request.user
+    role = getattr(user, 'role', None) if user and user.is_authenticated else None
+    request._cached_role = role
+    return role
+
+
 class IsAdminOrRegistrar(permissions.BasePermission):
     """
     Permission class that allows access to administrators and registrars.
@@ -8,11 +25,7 @@ class IsAdminOrRegistrar(permissions.BasePermission):
     
     def has_permission(self, request, view):
         """Check if user is admin or registrar."""
-        return (
-            request.user and
-            request.user.is_authenticated and
-            request.user.role in ['ADMIN', 'REGISTRAR']
-        )
+        return _role(request) in ADMIN_OR_REGISTRAR
 
 
 class IsAdminOrAcademic(permissions.BasePermission):
@@ -22,11 +35,7 @@ class IsAdminOrAcademic(permissions.BasePermission):
     
     def has_permission(self, request, view):
         """Check if user is admin or academic staff."""
-        return (
-            request.user and
-            request.user.is_authenticated and
-            request.user.role in ['ADMIN', 'ACADEMIC']
-        )
+        return _role(request) in ADMIN_OR_ACADEMIC
 
 
 class IsAdminOrReadOnly(permissions.BasePermission):
@@ -38,13 +47,9 @@ class IsAdminOrReadOnly(permissions.BasePermission):
     def has_permission(self, request, view):
         """Check permissions based on request method."""
         if request.method in permissions.SAFE_METHODS:
-            return request.user and request.user.is_authenticated
+            return bool(request.user and request.user.is_authenticated)
         
-        return (
-            request.user and
-            request.user.is_authenticated and
-            request.user.role == 'ADMIN'
-        )
+        return _role(request) == 'ADMIN'
 
 
 class IsStudent(permissions.BasePermission):
@@ -54,11 +59,7 @@ class IsStudent(permissions.BasePermission):
     
     def has_permission(self, request, view):
         """Check if user is a student."""
-        return (
-            request.user and
-            request.user.is_authenticated and
-            request.user.role == 'STUDENT'
-        )
+        return _role(request) == 'STUDENT'
 
 
 class IsOwnerOrAdmin(permissions.BasePermission):
@@ -69,8 +70,8 @@ class IsOwnerOrAdmin(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         """Check if user is owner or admin."""
         # Admin has full access
-        if request.user.role == 'ADMIN':
+        if _role(request) == 'ADMIN':
             return True
         
-        # Check if user is the student in the enrollment
-        return obj.student == request.user
\ No newline at end of file
+        # Check if user is the student in the enrollment (no student fetch)
+        return obj.student_id == request.user.pk
@@ -1,11 +1,25 @@
 # enrollment
 from rest_framework import serializers
+from django.db.models import Count, F, Prefetch
 from django.utils import timezone
 from .models import Enrollment
 from accounts.serializers import StudentSerializer
+from courses.models import Course
 from courses.serializers import CourseListSerializer
 
 
+def course_detail_queryset():
+    """Courses annotated with everything a nested CourseListSerializer reads."""
+    return Course.objects.annotate(
+        category_name=F('category__name'),
+        enrollment_count=Count('enrollments', distinct=True),
+        prerequisite_count=Count('prerequisites', distinct=True)
+    ).only(
+        'id', 'title', 'level', 'duration', 'price', 'category',
+        'is_active', 'created_at'
+    )
+
+
 class EnrollmentSerializer(serializers.ModelSerializer):
     """Full serializer for Enrollment model."""
     
@@ -46,6 +60,25 @@ class EnrollmentSerializer(serializers.ModelSerializer):
             'student_name', 'student_email', 'course_title', 'course_price'
         ]
     
+    @classmethod
+    def prefetch_queryset(cls, queryset):
+        """
+        Load everything the serializer reads in a fixed number of queries:
+        course_detail counts, prerequisites, payment totals and the
+        student's completed courses (for prerequisites_met).
+        """
+        courses = course_detail_queryset().prefetch_related('prerequisites')
+        completed = Enrollment.objects.filter(
+            status='COMPLETED'
+        ).only('id', 'course_id', 'student_id')
+        
+        return queryset.with_payment_totals().with_duration_days().select_related(
+            'student', 'verified_by'
+        ).prefetch_related(
+            Prefetch('course', queryset=courses),
+            Prefetch('student__enrollments', queryset=completed, to_attr='_completed_enrollments')
+        )
+    
     def get_payment_summary(self, obj):
         """Get payment summary for enrollment."""
         return obj.get_payment_summary()
@@ -68,7 +101,7 @@ class EnrollmentSerializer(serializers.ModelSerializer):
 class EnrollmentListSerializer(serializers.ModelSerializer):
     """Simplified serializer for enrollment listing."""
     
-    student_name = serializers.CharField(source='student.get_full_name', read_only=True)
+    student_name = serializers.CharField(source='get_student_name', read_only=True)
     course_title = serializers.CharField(source='course.title', read_only=True)
     course_price = serializers.DecimalField(
         source='course.price',
@@ -86,6 +119,16 @@ class EnrollmentListSerializer(serializers.ModelSerializer):
             'status', 'payment_status'
         ]
     
+    @classmethod
+    def prefetch_queryset(cls, queryset):
+        """Join the course, annotate payment totals and the student name."""
+        return queryset.with_payment_totals().with_student_name().select_related(
+            'course'
+        ).only(
+            'id', 'student_id', 'course_id', 'enrollment_date',
+            'completion_date', 'status', 'course__title', 'course__price'
+        )
+    
     def get_payment_status(self, obj):
         """Get simplified payment status."""
         summary = obj.get_payment_summary()
@@ -140,25 +183,28 @@ class EnrollmentCreateSerializer(serializers.ModelSerializer):
                 'course': 'Student is already enrolled in this course.'
             })
         
-        # Check prerequisites
-        prerequisites = course.prerequisites.all()
-        if prerequisites.exists():
-            completed_courses = Enrollment.objects.filter(
-                student=student,
-                status='COMPLETED'
-            ).values_list('course_id', flat=True)
-            
-            missing_prerequisites = []
-            for prereq in prerequisites:
-                if prereq.id not in completed_courses:
-                    missing_prerequisites.append(prereq.title)
-            
-            if missing_prerequisites:
-                raise serializers.ValidationError({
-                    'course': f"Missing prerequisites: {', '.join(missing_prerequisites)}"
-                })
+        # Check prerequisites with a single anti-join query
+        completed_courses = Enrollment.objects.filter(
+            student=student,
+            status='COMPLETED'
+        ).values('course_id')
+        missing_prerequisites = list(
+            course.prerequisites.exclude(
+                id__in=completed_courses
+            ).values_list('title', flat=True)
+        )
+        if missing_prerequisites:
+            raise serializers.ValidationError({
+                'course': f"Missing prerequisites: {', '.join(missing_prerequisites)}"
+            })
         
         return attrs
+    
+    def create(self, validated_data):
+        """Create the enrollment without re-running the checks from validate()."""
+        enrollment = Enrollment(**validated_data)
+        enrollment.save(skip_clean=True)
+        return enrollment
 
 
 class EnrollmentUpdateSerializer(serializers.ModelSerializer):
@@ -174,10 +220,9 @@ class EnrollmentUpdateSerializer(serializers.ModelSerializer):
         new_status = attrs.get('status', instance.status)
         
         # Prevent invalid status transitions
-        if instance.status == 'COMPLETED' and new_status != 'COMPLETED':
-            raise serializers.ValidationError(
-                "Cannot change status of a completed enrollment."
-            )
+        error = instance.transition_error(new_status)
+        if error:
+            raise serializers.ValidationError(error)
         
         # Require completion_date for COMPLETED status
         if new_status == 'COMPLETED':
@@ -218,6 +263,15 @@ class StudentEnrollmentSerializer(serializers.ModelSerializer):
             'duration_days', 'notes'
         ]
     
+    @classmethod
+    def prefetch_queryset(cls, queryset):
+        """Prefetch annotated courses and annotate payment totals."""
+        return queryset.with_payment_totals().with_duration_days().prefetch_related(
+            Prefetch('course', queryset=course_detail_queryset())
+        ).only(
+            'id', 'course', 'enrollment_date', 'completion_date', 'status', 'notes'
+        )
+    
     def get_payment_summary(self, obj):
         """Get payment summary."""
         return obj.get_payment_summary()
@@ -1,7 +1,10 @@
+import logging
 from django.db.models.signals import post_save, pre_save
 from django.dispatch import receiver
 from .models import Enrollment
 
+logger = logging.getLogger(__name__)
+
 
 @receiver(pre_save, sender=Enrollment)
 def enrollment_status_change(sender, instance, **kwargs):
@@ -12,20 +15,23 @@ def enrollment_status_change(sender, instance, **kwargs):
     - Logging status changes
     - Triggering other actions
     """
-    if instance.pk:  # Only for existing enrollments
-        try:
-            old_instance = Enrollment.objects.get(pk=instance.pk)
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and 'status' not in update_fields:
+        return
+    
+    # _loaded_status is set by Enrollment.from_db(), so no refetch is needed
+    old_status = getattr(instance, '_loaded_status', None)
+    if instance.pk and old_status is not None:  # Only for existing enrollments
+        # Check if status changed
+        if old_status != instance.status:
+            # Log status change
+            logger.info(
+                "Enrollment %s status changed from %s to %s",
+                instance.id, old_status, instance.status
+            )
             
-            # Check if status changed
-            if old_instance.status != instance.status:
-                # Log status change
-                print(f"Enrollment {instance.id} status changed from {old_instance.status} to {instance.status}")
-                
-                # Add custom logic here
-                # For example: send email notification, create audit log, etc.
-                
-        except Enrollment.DoesNotExist:
-            pass
+            # Add custom logic here
+            # For example: send email notification, create audit log, etc.
 
 
 @receiver(post_save, sender=Enrollment)
@@ -35,7 +41,10 @@ def enrollment_created(sender, instance, created, **kwargs):
     """
     if created:
         # Log enrollment creation
-        print(f"New enrollment created: {instance.student.get_full_name()} enrolled in {instance.course.title}")
+        logger.info(
+            "New enrollment created: student %s enrolled in course %s",
+            instance.student_id, instance.course_id
+        )
         
         # Add custom logic here
         # For example: send welcome email, create initial notifications, etc.
\ No newline at end of file
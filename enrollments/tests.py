@@ -1,18 +1,35 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from decimal import Decimal
+from django.contrib.admin.sites import site
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
 from django.utils import timezone
 from django.core.exceptions import ValidationError
+from rest_framework.test import APIClient
 from accounts.models import User
 from courses.models import Course, Category
+from payments.models import Payment
 from .models import Enrollment
+from .serializers import EnrollmentSerializer
+
+
+def make_enrollments(students, course, **fields):
+    """Create one enrollment per student with a single bulk INSERT."""
+    return Enrollment.objects.bulk_create([
+        Enrollment(student=student, course=course, **fields)
+        for student in students
+    ])
 
 
 class EnrollmentModelTest(TestCase):
     """Test cases for Enrollment model."""
     
-    def setUp(self):
-        """Set up test data."""
+    @classmethod
+    def setUpTestData(cls):
+        """Set up test data shared by every test in the class."""
         # Create users
-        self.admin = User.objects.create_user(
+        cls.admin = User.objects.create_user(
             username='admin',
             email='admin@test.com',
             password='testpass123',
@@ -21,7 +38,7 @@ class EnrollmentModelTest(TestCase):
             role='ADMIN'
         )
         
-        self.student = User.objects.create_user(
+        cls.student = User.objects.create_user(
             username='student',
             email='student@test.com',
             password='testpass123',
@@ -31,32 +48,32 @@ class EnrollmentModelTest(TestCase):
         )
         
         # Create category
-        self.category = Category.objects.create(
+        cls.category = Category.objects.create(
             name='Programming',
             description='Programming courses'
         )
         
         # Create courses
-        self.course1 = Course.objects.create(
+        cls.course1 = Course.objects.create(
             title='Python Basics',
             description='Learn Python',
             duration=40,
             price=10000.00,
             level='BEGINNER',
-            category=self.category,
-            created_by=self.admin
+            category=cls.category,
+            created_by=cls.admin
         )
         
-        self.course2 = Course.objects.create(
+        cls.course2 = Course.objects.create(
             title='Advanced Python',
             description='Advanced Python',
             duration=60,
             price=15000.00,
             level='ADVANCED',
-            category=self.category,
-            created_by=self.admin
+            category=cls.category,
+            created_by=cls.admin
         )
-        self.course2.prerequisites.add(self.course1)
+        cls.course2.prerequisites.add(cls.course1)
     
     def test_create_enrollment(self):
         """Test creating a valid enrollment."""
@@ -114,6 +131,36 @@ class EnrollmentModelTest(TestCase):
         
         self.assertEqual(enrollment.status, 'CANCELLED')
     
+    def test_transition_error(self):
+        """Test the allowed status transition table."""
+        enrollment = Enrollment.objects.create(
+            student=self.student,
+            course=self.course1
+        )
+        self.assertIsNone(enrollment.transition_error('COMPLETED'))
+        
+        enrollment.mark_cancelled()
+        self.assertIsNone(enrollment.transition_error('CANCELLED'))
+        self.assertIsNotNone(enrollment.transition_error('IN_PROGRESS'))
+        with self.assertRaises(ValidationError):
+            enrollment.mark_completed()
+    
+    def test_status_transition_single_update(self):
+        """Test status transitions issue only the UPDATE."""
+        enrollment = Enrollment.objects.create(
+            student=self.student,
+            course=self.course1,
+            enrollment_date=date(2025, 1, 1)
+        )
+        enrollment = Enrollment.objects.get(pk=enrollment.pk)
+        
+        with self.assertNumQueries(1):
+            enrollment.mark_completed(verified_by=self.admin)
+        
+        enrollment.refresh_from_db()
+        self.assertEqual(enrollment.status, 'COMPLETED')
+        self.assertEqual(enrollment.verified_by, self.admin)
+    
     def test_prerequisite_check(self):
         """Test prerequisite checking."""
         enrollment = Enrollment.objects.create(
@@ -139,6 +186,88 @@ class EnrollmentModelTest(TestCase):
         self.assertTrue(met)
         self.assertEqual(len(missing), 0)
     
+    def test_missing_prerequisites_query(self):
+        """Test missing prerequisites are found with a single query."""
+        enrollment = Enrollment.objects.create(
+            student=self.student,
+            course=self.course2,
+            enrollment_date=date(2025, 1, 1)
+        )
+        enrollment = Enrollment.objects.select_related('course').get(pk=enrollment.pk)
+        
+        with self.assertNumQueries(1):
+            met, missing = enrollment.check_prerequisites()
+        
+        self.assertFalse(met)
+        self.assertEqual([p.id for p in missing], [self.course1.id])
+    
+    def test_bulk_enroll(self):
+        """Test bulk enrollment creates valid rows and reports the rest."""
+        rows = [
+            {'student_id': self.student.id, 'course_id': self.course1.id,
+             'enrollment_date': date(2025, 1, 1)},
+            {'student_id': self.student.id, 'course_id': self.course1.id,
+             'enrollment_date': date(2025, 1, 1)},
+            {'student_id': self.admin.id, 'course_id': self.course2.id,
+             'enrollment_date': date(2025, 1, 1)},
+            {'student_id': self.student.id, 'course_id': self.course2.id + 100,
+             'enrollment_date': date(2025, 1, 1)},
+            {'student_id': self.student.id, 'course_id': self.course2.id,
+             'enrollment_date': date(2026, 1, 5), 'status': 'COMPLETED',
+             'completion_date': date(2025, 1, 1)},
+        ]
+        
+        # Three validation lookups plus one INSERT (inside a savepoint)
+        with self.assertNumQueries(6):
+            created, errors = Enrollment.bulk_enroll(rows)
+        
+        self.assertEqual(len(created), 1)
+        self.assertIsNotNone(created[0].pk)
+        self.assertEqual([index for index, _ in errors], [1, 2, 3, 4])
+        self.assertIn('does not exist', errors[2][1])
+        self.assertIn('before enrollment date', errors[3][1])
+        self.assertTrue(
+            Enrollment.objects.filter(student=self.student, course=self.course1).exists()
+        )
+    
+    def test_admin_mark_completed_respects_dates(self):
+        """Test the admin bulk completion sets a valid completion date."""
+        today = timezone.now().date()
+        current = Enrollment.objects.create(
+            student=self.student, course=self.course1, enrollment_date=today
+        )
+        future = Enrollment.objects.create(
+            student=self.student, course=self.course2,
+            enrollment_date=today + timedelta(days=3)
+        )
+        request = RequestFactory().post('/')
+        request.user = self.admin
+        request.session = {}
+        request._messages = FallbackStorage(request)
+        
+        site._registry[Enrollment].mark_completed(request, Enrollment.objects.all())
+        
+        current.refresh_from_db()
+        future.refresh_from_db()
+        self.assertEqual(current.status, 'COMPLETED')
+        self.assertEqual(current.completion_date, today)
+        current.clean_dates()
+        self.assertEqual(future.status, 'IN_PROGRESS')
+    
+    def test_loaded_status_tracking(self):
+        """Test the status loaded from the database is remembered."""
+        enrollment = Enrollment.objects.create(
+            student=self.student,
+            course=self.course1,
+            enrollment_date=date(2025, 1, 1)
+        )
+        enrollment = Enrollment.objects.get(pk=enrollment.pk)
+        enrollment.status = 'CANCELLED'
+        self.assertEqual(enrollment._loaded_status, 'IN_PROGRESS')
+        
+        enrollment.save()
+        self.assertEqual(enrollment._loaded_status, 'CANCELLED')
+    
     def test_payment_summary(self):
         """Test payment summary calculation."""
         enrollment = Enrollment.objects.create(
@@ -153,6 +282,54 @@ class EnrollmentModelTest(TestCase):
         self.assertEqual(summary['outstanding_balance'], self.course1.price)
         self.assertFalse(summary['is_fully_paid'])
     
+    def test_serializer_prefetch_queryset(self):
+        """Test serializing many enrollments uses a fixed number of queries."""
+        students = [
+            User.objects.create_user(
+                username=f'student{i}',
+                email=f'student{i}@test.com',
+                password='testpass123',
+                role='STUDENT'
+            )
+            for i in range(3)
+        ]
+        make_enrollments(students, self.course2, enrollment_date=date(2025, 1, 1))
+        
+        queryset = EnrollmentSerializer.prefetch_queryset(Enrollment.objects.all())
+        with self.assertNumQueries(4):
+            data = EnrollmentSerializer(queryset, many=True).data
+        
+        self.assertEqual(len(data), 3)
+        self.assertFalse(data[0]['prerequisites_met']['met'])
+        self.assertEqual(data[0]['course_detail']['enrollment_count'], 3)
+    
+    def test_payment_summary_with_totals(self):
+        """Test annotated payment totals match the unannotated summary."""
+        enrollment = Enrollment.objects.create(
+            student=self.student,
+            course=self.course1,
+            enrollment_date=date(2025, 1, 1)
+        )
+        for i, amount in enumerate(('2500.00', '1500.00')):
+            Payment.objects.create(
+                enrollment=enrollment,
+                amount=Decimal(amount),
+                payment_date=date(2025, 1, 2),
+                payment_method='CASH',
+                receipt_number=f'RCP-TEST-{i}'
+            )
+        
+        annotated = Enrollment.objects.with_payment_totals().get(pk=enrollment.pk)
+        summary = annotated.get_payment_summary()
+        plain = Enrollment.objects.get(pk=enrollment.pk)
+        self.assertEqual(summary, plain.get_payment_summary())
+        self.assertEqual(summary['total_paid'], Decimal('4000.00'))
+        self.assertEqual(summary['payment_count'], 2)
+        
+        # Memoized on the instance until the enrollment is saved
+        with self.assertNumQueries(0):
+            self.assertIs(annotated.get_payment_summary(), summary)
+    
     def test_duration_days(self):
         """Test duration calculation."""
         enrollment = Enrollment.objects.create(
@@ -164,6 +341,25 @@ class EnrollmentModelTest(TestCase):
         
         self.assertGreaterEqual(duration, 0)
     
+    def test_duration_days_annotation(self):
+        """Test the SQL duration matches the Python calculation."""
+        today = timezone.now().date()
+        enrollment = Enrollment.objects.create(
+            student=self.student,
+            course=self.course1,
+            enrollment_date=today - timedelta(days=10)
+        )
+        
+        annotated = Enrollment.objects.with_duration_days().get(pk=enrollment.pk)
+        self.assertEqual(annotated.get_duration_days(), 10)
+        
+        # Completing the enrollment drops the stale annotation
+        annotated.mark_completed(verified_by=self.admin)
+        self.assertEqual(
+            annotated.get_duration_days(),
+            (annotated.completion_date - annotated.enrollment_date).days
+        )
+    
     def test_string_representation(self):
         """Test string representation."""
         enrollment = Enrollment.objects.create(
@@ -173,10 +369,161 @@ class EnrollmentModelTest(TestCase):
         
         expected = f"{self.student.get_full_name()} - {self.course1.title} (IN_PROGRESS)"
         self.assertEqual(str(enrollment), expected)
+    
+    def test_status_change_signal_uses_loaded_status(self):
+        """Test the pre_save handler sees the loaded status without a refetch."""
+        enrollment = Enrollment.objects.create(student=self.student, course=self.course1)
+        enrollment = Enrollment.objects.get(pk=enrollment.pk)
+        enrollment.status = 'CANCELLED'
+        
+        with self.assertLogs('enrollments.signals', level='INFO') as logs:
+            with self.assertNumQueries(1):
+                enrollment.save(update_fields=['status'])
+        self.assertIn('from IN_PROGRESS to CANCELLED', logs.output[0])
+    
+    def test_creation_signal_logs(self):
+        """Test the post_save handler logs new enrollments through the module logger."""
+        with self.assertLogs('enrollments.signals', level='INFO') as logs:
+            Enrollment.objects.create(student=self.student, course=self.course1)
+        self.assertEqual(
+            logs.output,
+            [f"INFO:enrollments.signals:New enrollment created: student "
+             f"{self.student.id} enrolled in course {self.course1.id}"]
+        )
 
 
 class EnrollmentAPITest(TestCase):
     """Test cases for Enrollment API endpoints."""
     
-    # Add API tests here if needed
-    pass
\ No newline at end of file
+    def setUp(self):
+        """Set up an admin, a student and a course."""
+        self.admin = User.objects.create_user(
+            username='admin',
+            email='admin@test.com',
+            password='testpass123',
+            role='ADMIN'
+        )
+        self.student = User.objects.create_user(
+            username='student',
+            email='student@test.com',
+            password='testpass123',
+            role='STUDENT'
+        )
+        self.course = Course.objects.create(
+            title='Python Basics',
+            description='Learn Python',
+            duration=40,
+            price=10000.00,
+            level='BEGINNER',
+            created_by=self.admin
+        )
+        
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+        cache.clear()
+    
+    def test_create_enrollment_checks_duplicates_once(self):
+        """Test creating an enrollment and rejecting a duplicate."""
+        url = '/api/enrollments/admin/enrollments/'
+        payload = {
+            'student': self.student.id,
+            'course': self.course.id,
+            'enrollment_date': '2025-01-01'
+        }
+        
+        response = self.client.post(url, payload)
+        self.assertEqual(response.status_code, 201)
+        
+        response = self.client.post(url, payload)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Enrollment.objects.count(), 1)
+    
+    def test_complete_response_queries(self):
+        """Test completing an enrollment uses a fixed number of queries."""
+        enrollment = Enrollment.objects.create(student=self.student, course=self.course)
+        url = f'/api/enrollments/admin/enrollments/{enrollment.id}/complete/'
+        
+        with self.assertNumQueries(5):
+            response = self.client.post(url, {'notes': 'Done'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['enrollment']['status'], 'COMPLETED')
+        
+        enrollment.refresh_from_db()
+        self.assertEqual(enrollment.verified_by, self.admin)
+        self.assertEqual(enrollment.notes, 'Done')
+    
+    def test_list_student_name(self):
+        """Test the list endpoint reads the annotated student name."""
+        self.student.first_name = 'Test'
+        self.student.last_name = 'Student'
+        self.student.save()
+        Enrollment.objects.create(student=self.student, course=self.course)
+        
+        response = self.client.get('/api/enrollments/admin/enrollments/')
+        self.assertEqual(response.status_code, 200)
+        
+        row = response.json()['results'][0]
+        self.assertEqual(row['student_name'], 'Test Student')
+        self.assertEqual(row['course_title'], 'Python Basics')
+    
+    def test_export_csv(self):
+        """Test streaming the enrollment CSV export."""
+        Enrollment.objects.create(student=self.student, course=self.course)
+        
+        response = self.client.get('/api/enrollments/admin/enrollments/export/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].startswith('ID,Student,Email,Course'))
+        self.assertIn('student,student@test.com,Python Basics,IN_PROGRESS', lines[1])
+    
+    def test_statistics_cached_per_filter(self):
+        """Test statistics are cached per filter set and refreshed on change."""
+        url = '/api/enrollments/admin/enrollments/statistics/'
+        Enrollment.objects.create(student=self.student, course=self.course)
+        
+        self.assertEqual(self.client.get(url).json()['total_enrollments'], 1)
+        filtered = self.client.get(url, {'course': self.course.id + 1})
+        self.assertEqual(filtered.json()['total_enrollments'], 0)
+        
+        Enrollment.objects.all().delete()
+        self.assertEqual(self.client.get(url).json()['total_enrollments'], 0)
+    
+    def test_statistics(self):
+        """Test aggregated enrollment statistics."""
+        today = timezone.now().date()
+        Enrollment.objects.create(
+            student=self.student,
+            course=self.course,
+            enrollment_date=date(today.year, today.month, 1),
+            status='COMPLETED',
+            completion_date=date(today.year, today.month, 1)
+        )
+        
+        response = self.client.get('/api/enrollments/admin/enrollments/statistics/')
+        self.assertEqual(response.status_code, 200)
+        
+        data = response.json()
+        self.assertEqual(data['total_enrollments'], 1)
+        self.assertEqual(data['completed_enrollments'], 1)
+        self.assertEqual(data['enrollments_by_status'], {'COMPLETED': 1})
+        self.assertEqual(len(data['enrollments_by_month']), 6)
+        self.assertEqual(data['enrollments_by_month'][-1]['count'], 1)
+        self.assertEqual(data['completion_rate'], 100.0)
+        self.assertEqual(data['avg_completion_time'], 0.0)
+        self.assertEqual(data['top_enrolled_courses'][0]['id'], self.course.id)
+        self.assertEqual(data['recent_enrollments'][0]['course_title'], 'Python Basics')
+    
+    def test_pending_completion_honours_filters(self):
+        """Test pending completion applies the same query params as the list."""
+        Enrollment.objects.create(student=self.student, course=self.course)
+        url = '/api/enrollments/admin/enrollments/pending_completion/'
+        
+        response = self.client.get(url, {'student': self.student.id})
+        self.assertEqual(len(response.json()['results']), 1)
+        response = self.client.get(url, {'student': self.student.id + 100})
+        self.assertEqual(response.json()['results'], [])
+        response = self.client.get(url, {'start_date': '2999-01-01'})
+        self.assertEqual(response.json()['results'], [])
@@ -1,13 +1,13 @@
 # enrollment
 from django.urls import path, include
-from rest_framework.routers import DefaultRouter
+from rest_framework.routers import SimpleRouter
 from .views import EnrollmentViewSet, StudentEnrollmentViewSet
 
 # Create routers
-admin_router = DefaultRouter()
+admin_router = SimpleRouter(trailing_slash=True)
 admin_router.register(r'enrollments', EnrollmentViewSet, basename='enrollment')
 
-student_router = DefaultRouter()
+student_router = SimpleRouter(trailing_slash=True)
 student_router.register(r'enrollments', StudentEnrollmentViewSet, basename='student-enrollment')
 
 app_name = 'enrollments'
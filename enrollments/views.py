@@ -1,13 +1,20 @@
 # enrollment
+import csv
 from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Count, Q, Avg, F
+from django.conf import settings
+from django.core.cache import cache
+from django.http import StreamingHttpResponse
+from django.db.models import Count, Q, Avg, F, Prefetch
+from django.db.models.functions import TruncMonth
 from django.utils import timezone
-from datetime import timedelta
+from datetime import date
 
+from payments.models import Payment
+from payments.serializers import PaymentSerializer
 from .models import Enrollment
 from .serializers import (
     EnrollmentSerializer, EnrollmentListSerializer,
@@ -19,12 +26,35 @@ from .permissions import IsAdminOrRegistrar, IsAdminOrAcademic
 from .filters import EnrollmentFilter
 
 
+# Seconds to keep a computed statistics payload
+STATISTICS_CACHE_TIMEOUT = 300
+
+# (header, field) pairs for the CSV export
+EXPORT_COLUMNS = [
+    ('ID', 'id'),
+    ('Student', 'student__username'),
+    ('Email', 'student__email'),
+    ('Course', 'course__title'),
+    ('Status', 'status'),
+    ('Enrollment Date', 'enrollment_date'),
+    ('Completion Date', 'completion_date'),
+    ('Total Paid', '_total_paid'),
+]
+
+
+class Echo:
+    """File-like object whose write() returns the value, for csv.writer."""
+    
+    def write(self, value):
+        return value
+
+
 class EnrollmentViewSet(viewsets.ModelViewSet):
     """ViewSet for managing enrollments."""
     
     queryset = Enrollment.objects.select_related(
-        'student', 'course', 'verified_by'
-    ).prefetch_related('course__category')
+        'student', 'course__category', 'verified_by'
+    )
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_class = EnrollmentFilter
     search_fields = [
@@ -49,8 +79,10 @@ class EnrollmentViewSet(viewsets.ModelViewSet):
     
     def get_serializer_class(self):
         """Return appropriate serializer based on action."""
-        if self.action == 'list':
+        if self.action in ['list', 'pending_completion', 'export']:
             return EnrollmentListSerializer
+        elif self.action == 'statistics':
+            return EnrollmentStatisticsSerializer
         elif self.action == 'create':
             return EnrollmentCreateSerializer
         elif self.action in ['update', 'partial_update']:
@@ -61,10 +93,29 @@ class EnrollmentViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """Filter queryset based on query parameters."""
-        queryset = Enrollment.objects.select_related(
-            'student', 'course', 'verified_by'
-        ).prefetch_related('course__category')
+        serializer_class = self.get_serializer_class()
+        if self.action == 'payments':
+            # One prefetch feeds both the payment list and the summary
+            queryset = Enrollment.objects.select_related(
+                'student', 'course'
+            ).prefetch_related(Prefetch(
+                'payments',
+                queryset=Payment.objects.select_related('received_by').order_by('-payment_date')
+            ))
+        elif self.action == 'complete':
+            # The response renders the enrollment with EnrollmentSerializer
+            queryset = EnrollmentSerializer.prefetch_queryset(Enrollment.objects.all())
+        elif hasattr(serializer_class, 'prefetch_queryset'):
+            queryset = serializer_class.prefetch_queryset(Enrollment.objects.all())
+        else:
+            queryset = Enrollment.objects.select_related(
+                'student', 'course__category', 'verified_by'
+            )
         
+        return self._filter_by_params(queryset)
+    
+    def _filter_by_params(self, queryset):
+        """Apply the student, course, date range and payment status query params."""
         # Filter by student
         student_id = self.request.query_params.get('student', None)
         if student_id:
@@ -109,9 +160,10 @@ class EnrollmentViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        if enrollment.status == 'CANCELLED':
+        error = enrollment.transition_error('COMPLETED')
+        if error:
             return Response(
-                {'error': 'Cannot complete a cancelled enrollment.'},
+                {'error': error},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
@@ -132,7 +184,9 @@ class EnrollmentViewSet(viewsets.ModelViewSet):
         if serializer.validated_data.get('notes'):
             enrollment.notes = serializer.validated_data['notes']
         
-        enrollment.save()
+        enrollment.save(update_fields=[
+            'status', 'completion_date', 'verified_by', 'notes', 'updated_at'
+        ])
         
         return Response({
             'message': 'Enrollment marked as completed successfully.',
@@ -144,16 +198,17 @@ class EnrollmentViewSet(viewsets.ModelViewSet):
         """Cancel an enrollment."""
         enrollment = self.get_object()
         
-        if enrollment.status == 'COMPLETED':
+        error = enrollment.transition_error('CANCELLED')
+        if error:
             return Response(
-                {'error': 'Cannot cancel a completed enrollment.'},
+                {'error': error},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
         enrollment.status = 'CANCELLED'
         if request.data.get('notes'):
             enrollment.notes = request.data.get('notes')
-        enrollment.save()
+        enrollment.save(update_fields=['status', 'notes', 'updated_at'])
         
         return Response({
             'message': 'Enrollment cancelled successfully.',
@@ -165,12 +220,7 @@ class EnrollmentViewSet(viewsets.ModelViewSet):
         """Get all payments for this enrollment."""
         enrollment = self.get_object()
         
-        # Import Payment model here to avoid circular import
-        from payments.models import Payment
-        from payments.serializers import PaymentSerializer
-        
-        payments = Payment.objects.filter(enrollment=enrollment).order_by('-payment_date')
-        serializer = PaymentSerializer(payments, many=True)
+        serializer = PaymentSerializer(enrollment.payments.all(), many=True)
         
         payment_summary = enrollment.get_payment_summary()
         
@@ -188,15 +238,13 @@ class EnrollmentViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def pending_completion(self, request):
         """Get enrollments pending completion verification."""
-        enrollments = self.get_queryset().filter(
-            status='IN_PROGRESS'
+        # Filter by status up front and prefetch only what the list needs
+        enrollments = self._filter_by_params(
+            EnrollmentListSerializer.prefetch_queryset(
+                Enrollment.objects.filter(status='IN_PROGRESS')
+            )
         ).order_by('enrollment_date')
         
-        # Filter by course if provided
-        course_id = request.query_params.get('course', None)
-        if course_id:
-            enrollments = enrollments.filter(course_id=course_id)
-        
         page = self.paginate_queryset(enrollments)
         if page is not None:
             serializer = EnrollmentListSerializer(page, many=True)
@@ -205,39 +253,79 @@ class EnrollmentViewSet(viewsets.ModelViewSet):
         serializer = EnrollmentListSerializer(enrollments, many=True)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Stream the filtered enrollments as CSV."""
+        rows = self.filter_queryset(self.get_queryset()).values_list(
+            *[field for _, field in EXPORT_COLUMNS]
+        ).iterator(chunk_size=settings.ENROLLMENT_EXPORT_CHUNK_SIZE)
+        
+        writer = csv.writer(Echo())
+        
+        def stream():
+            yield writer.writerow([header for header, _ in EXPORT_COLUMNS])
+            for row in rows:
+                yield writer.writerow(row)
+        
+        response = StreamingHttpResponse(stream(), content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="enrollments.csv"'
+        return response
+    
     @action(detail=False, methods=['get'])
     def statistics(self, request):
         """Get comprehensive enrollment statistics."""
+        data = cache.get_or_set(
+            Enrollment.statistics_cache_key(request.query_params),
+            self._build_statistics,
+            STATISTICS_CACHE_TIMEOUT
+        )
+        return Response(data)
+    
+    def _build_statistics(self):
+        """Compute the statistics payload for the current filters."""
         queryset = self.get_queryset()
         
-        # Basic counts
-        total_enrollments = queryset.count()
-        active_enrollments = queryset.filter(status='IN_PROGRESS').count()
-        completed_enrollments = queryset.filter(status='COMPLETED').count()
-        cancelled_enrollments = queryset.filter(status='CANCELLED').count()
+        # Status counts and average completion time in a single aggregate
+        stats = queryset.statistics()
+        total_enrollments = stats['total']
+        active_enrollments = stats['active']
+        completed_enrollments = stats['completed']
+        cancelled_enrollments = stats['cancelled']
+        
+        # Enrollments by status (only statuses that occur)
+        enrollments_by_status = {
+            status_code: count
+            for status_code, count in (
+                ('IN_PROGRESS', active_enrollments),
+                ('COMPLETED', completed_enrollments),
+                ('CANCELLED', cancelled_enrollments),
+            )
+            if count
+        }
         
-        # Enrollments by status
-        enrollments_by_status = dict(
-            queryset.values('status').annotate(
+        # Enrollments by calendar month (last 6 months) in one GROUP BY
+        today = timezone.now().date()
+        months = []
+        year, month = today.year, today.month
+        for _ in range(6):
+            months.append(date(year, month, 1))
+            year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+        months.reverse()
+        
+        counts_by_month = dict(
+            queryset.filter(enrollment_date__gte=months[0]).annotate(
+                month=TruncMonth('enrollment_date')
+            ).order_by().values('month').annotate(
                 count=Count('id')
-            ).values_list('status', 'count')
+            ).values_list('month', 'count')
         )
-        
-        # Enrollments by month (last 6 months)
-        six_months_ago = timezone.now().date() - timedelta(days=180)
-        monthly_enrollments = []
-        
-        for i in range(6):
-            month_start = six_months_ago + timedelta(days=30*i)
-            month_end = month_start + timedelta(days=30)
-            count = queryset.filter(
-                enrollment_date__gte=month_start,
-                enrollment_date__lt=month_end
-            ).count()
-            monthly_enrollments.append({
+        monthly_enrollments = [
+            {
                 'month': month_start.strftime('%Y-%m'),
-                'count': count
-            })
+                'count': counts_by_month.get(month_start, 0)
+            }
+            for month_start in months
+        ]
         
         # Completion rate
         completion_rate = 0
@@ -245,44 +333,35 @@ class EnrollmentViewSet(viewsets.ModelViewSet):
             completion_rate = (completed_enrollments / total_enrollments) * 100
         
         # Average completion time (in days)
-        completed = queryset.filter(
-            status='COMPLETED',
-            completion_date__isnull=False
-        )
-        avg_completion_time = 0
-        if completed.exists():
-            total_days = sum([
-                (e.completion_date - e.enrollment_date).days
-                for e in completed
-            ])
-            avg_completion_time = total_days / completed.count()
-        
-        # Top enrolled courses
-        from courses.models import Course
-        courses = Course.objects.annotate(
-            enrollment_count=Count('enrollments')
-        ).order_by('-enrollment_count')[:5]
+        avg_completion = stats['avg_completion']
+        avg_completion_time = avg_completion.total_seconds() / 86400 if avg_completion else 0
         
+        # Top enrolled courses, grouped from the same enrollments
         top_enrolled_courses = [
             {
-                'id': course.id,
-                'title': course.title,
-                'enrollment_count': course.enrollment_count
+                'id': row['course_id'],
+                'title': row['course__title'],
+                'enrollment_count': row['enrollment_count']
             }
-            for course in courses
+            for row in queryset.order_by().values('course_id', 'course__title').annotate(
+                enrollment_count=Count('id')
+            ).order_by('-enrollment_count', 'course_id')[:5]
         ]
         
-        # Recent enrollments
-        recent = queryset.order_by('-enrollment_date')[:5]
+        # Recent enrollments, read as plain rows in one JOIN
+        recent = queryset.order_by('-enrollment_date').values(
+            'id', 'student__first_name', 'student__last_name',
+            'course__title', 'enrollment_date', 'status'
+        )[:5]
         recent_enrollments = [
             {
-                'id': e.id,
-                'student_name': e.student.get_full_name(),
-                'course_title': e.course.title,
-                'enrollment_date': e.enrollment_date,
-                'status': e.status
+                'id': row['id'],
+                'student_name': f"{row['student__first_name']} {row['student__last_name']}".strip(),
+                'course_title': row['course__title'],
+                'enrollment_date': row['enrollment_date'],
+                'status': row['status']
             }
-            for e in recent
+            for row in recent
         ]
         
         data = {
@@ -298,8 +377,7 @@ class EnrollmentViewSet(viewsets.ModelViewSet):
             'recent_enrollments': recent_enrollments
         }
         
-        serializer = EnrollmentStatisticsSerializer(data)
-        return Response(serializer.data)
+        return dict(EnrollmentStatisticsSerializer(data).data)
 
 
 class StudentEnrollmentViewSet(viewsets.ReadOnlyModelViewSet):
@@ -313,20 +391,26 @@ class StudentEnrollmentViewSet(viewsets.ReadOnlyModelViewSet):
     
     def get_queryset(self):
         """Return only the current user's enrollments."""
-        return Enrollment.objects.filter(
-            student=self.request.user
-        ).select_related('course', 'course__category')
+        return StudentEnrollmentSerializer.prefetch_queryset(
+            Enrollment.objects.filter(student=self.request.user)
+        )
+    
+    def _with_status(self, status_code):
+        """Return the current user's enrollments with the given status."""
+        return StudentEnrollmentSerializer.prefetch_queryset(
+            Enrollment.objects.filter(student=self.request.user, status=status_code)
+        )
     
     @action(detail=False, methods=['get'])
     def active(self, request):
         """Get student's active enrollments."""
-        enrollments = self.get_queryset().filter(status='IN_PROGRESS')
+        enrollments = self._with_status('IN_PROGRESS')
         serializer = self.get_serializer(enrollments, many=True)
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
     def completed(self, request):
         """Get student's completed enrollments."""
-        enrollments = self.get_queryset().filter(status='COMPLETED')
+        enrollments = self._with_status('COMPLETED')
         serializer = self.get_serializer(enrollments, many=True)
         return Response(serializer.data)
\ No newline at end of file
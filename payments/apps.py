@@ -8,6 +8,4 @@ class PaymentsConfig(AppConfig):
     
     def ready(self):
         """Import signal handlers when app is ready."""
-        # Import signals here if you create any
-        # import payments.signals
-        pass
\ No newline at end of file
+        import payments.signals
\ No newline at end of file
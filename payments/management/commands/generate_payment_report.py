@@ -4,10 +4,11 @@ Usage: python manage.py generate_payment_report --start-date 2025-01-01 --end-da
 """
 
 from django.core.management.base import BaseCommand
+from django.db.models import Count, Sum
 from django.utils import timezone
 from datetime import datetime, timedelta
 from payments.models import Payment
-from payments.utils import export_payment_report_csv
+from payments.utils import write_payment_report_csv
 from decimal import Decimal
 
 
@@ -63,21 +64,15 @@ class Command(BaseCommand):
         payments = Payment.objects.filter(
             payment_date__gte=start_date,
             payment_date__lte=end_date
-        ).select_related(
-            'enrollment__student',
-            'enrollment__course',
-            'received_by'
-        ).order_by('payment_date')
+        )
         
         if payment_method:
             payments = payments.filter(payment_method=payment_method)
         
-        # Calculate statistics
-        total_revenue = payments.aggregate(
-            total=models.Sum('amount')
-        )['total'] or Decimal('0.00')
-        
-        payment_count = payments.count()
+        # Calculate statistics on the bare payments table, in one query
+        stats = payments.aggregate(total=Sum('amount'), count=Count('id'))
+        total_revenue = stats['total'] or Decimal('0.00')
+        payment_count = stats['count']
         
         # Display summary
         self.stdout.write(self.style.SUCCESS(f"\nPayment Summary:"))
@@ -88,10 +83,8 @@ class Command(BaseCommand):
             avg_payment = total_revenue / payment_count
             self.stdout.write(f"  Average Payment: ${avg_payment:,.2f}")
         
-        # Export to CSV
-        csv_content = export_payment_report_csv(payments, output_file)
-        
-        with open(output_file, 'w') as f:
-            f.write(csv_content)
+        # Export to CSV, streaming rows straight to the file
+        with open(output_file, 'w', newline='') as f:
+            write_payment_report_csv(payments.order_by('payment_date'), f, chunk_size=2000)
         
         self.stdout.write(self.style.SUCCESS(f"\nReport exported to: {output_file}"))
\ No newline at end of file
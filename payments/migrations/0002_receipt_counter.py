@@ -0,0 +1,26 @@
+# Generated by Django 5.2.7 on 2026-10-15 23:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReceiptCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('month', models.PositiveSmallIntegerField()),
+                ('last_value', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'payments_receipt_counter',
+                'constraints': [models.UniqueConstraint(fields=('year', 'month'), name='receipt_counter_unique_month')],
+            },
+        ),
+    ]
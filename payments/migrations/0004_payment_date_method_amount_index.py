@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-16 00:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('enrollments', '0003_enrollment_status_date_index'),
+        ('payments', '0003_payment_date_method_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='payment',
+            name='pay_date_method',
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['payment_date', 'payment_method', 'amount'], name='pay_date_method_amount'),
+        ),
+    ]
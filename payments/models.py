@@ -1,9 +1,40 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.conf import settings
+from django.core.cache import cache
 from django.core.validators import MinValueValidator
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from decimal import Decimal
+from courses.models import Course
+from enrollments.models import Enrollment
+
+
+STATISTICS_VERSION_KEY = 'payment:stats:ver'
+
+
+class PaymentQuerySet(models.QuerySet):
+    """QuerySet for Payment with shared annotation helpers."""
+    
+    def with_paid_to_date(self):
+        """
+        Annotate each payment with ``_paid_to_date``, the enrollment's total
+        paid up to and including that payment's date.
+        """
+        paid = Payment.objects.filter(
+            enrollment=OuterRef('enrollment'),
+            payment_date__lte=OuterRef('payment_date')
+        ).order_by().values('enrollment').annotate(
+            total=models.Sum('amount')
+        ).values('total')
+        return self.annotate(
+            _paid_to_date=Coalesce(
+                Subquery(paid),
+                models.Value(Decimal('0')),
+                output_field=models.DecimalField(max_digits=10, decimal_places=2)
+            )
+        )
 
 
 class Payment(models.Model):
@@ -59,6 +90,8 @@ class Payment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = PaymentQuerySet.as_manager()
+    
     class Meta:
         db_table = 'payments_payment'
         verbose_name = 'Payment'
@@ -66,7 +99,13 @@ class Payment(models.Model):
         ordering = ['-payment_date', '-created_at']
         indexes = [
             models.Index(fields=['enrollment', 'payment_date']),
-            models.Index(fields=['payment_date']),
+            # Date-range reports, optionally narrowed to one method; the
+            # leading payment_date column also serves plain date ranges, and
+            # amount makes the revenue sums index-only
+            models.Index(
+                fields=['payment_date', 'payment_method', 'amount'],
+                name='pay_date_method_amount'
+            ),
             models.Index(fields=['receipt_number']),
             models.Index(fields=['payment_method']),
         ]
@@ -75,14 +114,16 @@ class Payment(models.Model):
         return f"Payment {self.receipt_number or self.id} - {self.enrollment.student.get_full_name()} - ${self.amount}"
     
     def save(self, *args, **kwargs):
-        """Generate receipt number and validate on save."""
-        if not self.pk:  # New payment
-            if not self.receipt_number:
-                self.receipt_number = self.generate_receipt_number()
-        
-        # Run validations
+        """Validate, then generate the receipt number and save."""
+        # Validate first so rejected payments never reserve a number
         self.clean()
-        super().save(*args, **kwargs)
+        
+        # The counter update commits or rolls back with the INSERT, which
+        # keeps the receipt sequence gap-free
+        with transaction.atomic():
+            if not self.pk and not self.receipt_number:
+                self.receipt_number = self.generate_receipt_number()
+            super().save(*args, **kwargs)
     
     def clean(self):
         """Validate payment business rules."""
@@ -99,12 +140,20 @@ class Payment(models.Model):
             })
         
         # Check if total payments don't exceed course price
-        existing_payments = Payment.objects.filter(
+        existing_total = Payment.objects.filter(
             enrollment=self.enrollment
-        ).exclude(pk=self.pk)
+        ).exclude(pk=self.pk).aggregate(
+            total=models.Sum('amount')
+        )['total'] or Decimal('0.00')
         
-        total_paid = sum(p.amount for p in existing_payments) + self.amount
-        course_price = self.enrollment.course.price
+        total_paid = existing_total + self.amount
+        if self.enrollment._meta.get_field('course').is_cached(self.enrollment):
+            course_price = self.enrollment.course.price
+        else:
+            # Only the price is needed, not the whole course row
+            course_price = Enrollment.objects.values_list(
+                'course__price', flat=True
+            ).get(pk=self.enrollment_id)
         
         if total_paid > course_price:
             raise ValidationError({
@@ -125,16 +174,17 @@ class Payment(models.Model):
     
     def generate_receipt_number(self):
         """Generate a unique receipt number."""
-        year = timezone.now().year
-        month = timezone.now().month
-        
-        # Count payments this month
-        count = Payment.objects.filter(
-            payment_date__year=year,
-            payment_date__month=month
-        ).count() + 1
-        
-        return f"RCP-{year}{month:02d}-{count:05d}"
+        return self.generate_receipt_numbers(1)[0]
+    
+    @classmethod
+    def generate_receipt_numbers(cls, count):
+        """Reserve ``count`` consecutive receipt numbers with one counter update."""
+        now = timezone.now()
+        last = ReceiptCounter.next_value(now.year, now.month, count)
+        return [
+            f"RCP-{now.year}{now.month:02d}-{value:05d}"
+            for value in range(last - count + 1, last + 1)
+        ]
     
     def get_student_name(self):
         """Return the student's full name."""
@@ -146,18 +196,34 @@ class Payment(models.Model):
     
     def get_remaining_balance(self):
         """Calculate remaining balance after this payment."""
-        total_paid = Payment.objects.filter(
-            enrollment=self.enrollment,
-            payment_date__lte=self.payment_date
-        ).aggregate(
-            total=models.Sum('amount')
-        )['total'] or Decimal('0.00')
+        enrollment = self.enrollment
+        # Annotated by Payment.objects.with_paid_to_date()
+        total_paid = getattr(self, '_paid_to_date', None)
+        if total_paid is None:
+            if 'payments' in getattr(enrollment, '_prefetched_objects_cache', {}):
+                # Sibling payments were prefetched along with the enrollment
+                total_paid = sum(
+                    (p.amount for p in enrollment.payments.all() if p.payment_date <= self.payment_date),
+                    Decimal('0.00')
+                )
+            else:
+                total_paid = Payment.objects.filter(
+                    enrollment=enrollment,
+                    payment_date__lte=self.payment_date
+                ).aggregate(
+                    total=models.Sum('amount')
+                )['total'] or Decimal('0.00')
         
         return self.enrollment.course.price - total_paid
     
     @classmethod
     def get_total_paid_for_enrollment(cls, enrollment):
         """Get total amount paid for an enrollment."""
+        total = getattr(enrollment, '_total_paid', None)
+        if total is not None:
+            # Annotated by Enrollment.objects.with_payment_totals()
+            return total
+        
         total = cls.objects.filter(
             enrollment=enrollment
         ).aggregate(
@@ -187,25 +253,88 @@ class Payment(models.Model):
         if end_date:
             queryset = queryset.filter(payment_date__lte=end_date)
         
-        total_revenue = queryset.aggregate(
-            total=models.Sum('amount')
-        )['total'] or Decimal('0.00')
+        # Per-method totals and counts in one GROUP BY
+        rows = {
+            row['payment_method']: row
+            for row in queryset.order_by().values('payment_method').annotate(
+                total=models.Sum('amount'),
+                count=models.Count('id')
+            )
+        }
         
-        payment_count = queryset.count()
+        total_revenue = sum((row['total'] for row in rows.values()), Decimal('0.00'))
+        payment_count = sum(row['count'] for row in rows.values())
         
-        by_method = {}
-        for method, _ in cls.PAYMENT_METHOD_CHOICES:
-            method_total = queryset.filter(
-                payment_method=method
-            ).aggregate(
-                total=models.Sum('amount')
-            )['total'] or Decimal('0.00')
-            
-            if method_total > 0:
-                by_method[method] = method_total
+        by_method = {
+            method: rows[method]['total']
+            for method, _ in cls.PAYMENT_METHOD_CHOICES
+            if method in rows and rows[method]['total'] > 0
+        }
         
         return {
             'total_revenue': total_revenue,
             'payment_count': payment_count,
             'by_method': by_method
-        }
\ No newline at end of file
+        }
+    
+    @staticmethod
+    def statistics_cache_key():
+        """
+        Return the cache key for the current version of the statistics
+        payload; it also follows the course statistics version, which
+        moves whenever a course or enrollment changes.
+        """
+        version = cache.get(STATISTICS_VERSION_KEY, 0)
+        return f"payment:stats:v{version}:{Course.statistics_cache_key()}"
+    
+    @staticmethod
+    def invalidate_statistics_cache():
+        """Bump the statistics version so the next request recomputes it."""
+        cache.add(STATISTICS_VERSION_KEY, 0, None)
+        cache.incr(STATISTICS_VERSION_KEY)
+
+
+class ReceiptCounter(models.Model):
+    """Per-month counter used to issue sequential receipt numbers."""
+    
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+    last_value = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        db_table = 'payments_receipt_counter'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['year', 'month'],
+                name='receipt_counter_unique_month'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.year}-{self.month:02d}: {self.last_value}"
+    
+    @classmethod
+    def next_value(cls, year, month, count=1):
+        """
+        Atomically advance the counter for the given month by ``count`` and
+        return the new value, the last of the reserved numbers.
+        """
+        counter = cls.objects.filter(year=year, month=month)
+        with transaction.atomic():
+            # The UPDATE row lock is held until commit, so the read below
+            # sees this increment and concurrent callers wait for it
+            if not counter.update(last_value=models.F('last_value') + count):
+                # First receipt of the month: continue after any receipts
+                # issued before the counter existed
+                prefix = f"RCP-{year}{month:02d}-"
+                cls.objects.get_or_create(
+                    year=year,
+                    month=month,
+                    defaults={
+                        'last_value': Payment.objects.filter(
+                            receipt_number__startswith=prefix
+                        ).count()
+                    }
+                )
+                counter.update(last_value=models.F('last_value') + count)
+            return counter.values_list('last_value', flat=True).get()
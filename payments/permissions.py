@@ -1,17 +1,25 @@
 from rest_framework import permissions
 
 
+# Role sets for membership checks; role is a column on the user row
+ADMIN_OR_FINANCE = frozenset(('ADMIN', 'FINANCE'))
+ADMIN_OR_REGISTRAR_OR_FINANCE = frozenset(('ADMIN', 'REGISTRAR', 'FINANCE'))
+
+
+def _role(user):
+    """Return the user's role, or None for anonymous users."""
+    if user and user.is_authenticated:
+        return getattr(user, 'role', None)
+    return None
+
+
 class IsAdminOrFinance(permissions.BasePermission):
     """
     Permission class that allows access only to Admin and Finance staff.
     """
     
     def has_permission(self, request, view):
-        return (
-            request.user and 
-            request.user.is_authenticated and 
-            request.user.role in ['ADMIN', 'FINANCE']
-        )
+        return _role(request.user) in ADMIN_OR_FINANCE
 
 
 class IsAdminOrRegistrarOrFinance(permissions.BasePermission):
@@ -20,11 +28,7 @@ class IsAdminOrRegistrarOrFinance(permissions.BasePermission):
     """
     
     def has_permission(self, request, view):
-        return (
-            request.user and 
-            request.user.is_authenticated and 
-            request.user.role in ['ADMIN', 'REGISTRAR', 'FINANCE']
-        )
+        return _role(request.user) in ADMIN_OR_REGISTRAR_OR_FINANCE
 
 
 class IsStudent(permissions.BasePermission):
@@ -33,8 +37,4 @@ class IsStudent(permissions.BasePermission):
     """
     
     def has_permission(self, request, view):
-        return (
-            request.user and 
-            request.user.is_authenticated and 
-            request.user.role == 'STUDENT'
-        )
\ No newline at end of file
+        return _role(request.user) == 'STUDENT'
\ No newline at end of file
@@ -1,8 +1,14 @@
 from rest_framework import serializers
+from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
+from django.utils.dateparse import parse_date
+from datetime import date
 from decimal import Decimal
+from django.db.models import Sum
 from .models import Payment
-from enrollments.serializers import EnrollmentListSerializer
+from .utils import CENT, to_decimal
+from enrollments.models import Enrollment
 
 
 class PaymentSerializer(serializers.ModelSerializer):
@@ -18,7 +24,13 @@ class PaymentSerializer(serializers.ModelSerializer):
         read_only=True
     )
     received_by_name = serializers.CharField(source='received_by.get_full_name', read_only=True)
-    remaining_balance = serializers.SerializerMethodField()
+    remaining_balance = serializers.DecimalField(
+        source='get_remaining_balance',
+        max_digits=10,
+        decimal_places=2,
+        coerce_to_string=False,
+        read_only=True
+    )
     
     class Meta:
         model = Payment
@@ -35,9 +47,14 @@ class PaymentSerializer(serializers.ModelSerializer):
             'course_title', 'course_price'
         ]
     
-    def get_remaining_balance(self, obj):
-        """Get remaining balance after this payment."""
-        return obj.get_remaining_balance()
+    @classmethod
+    def prefetch_queryset(cls, queryset):
+        """Join the enrollment's student and course, the receiver, and balances."""
+        return queryset.with_paid_to_date().select_related(
+            'enrollment__student',
+            'enrollment__course',
+            'received_by'
+        )
 
 
 class PaymentListSerializer(serializers.ModelSerializer):
@@ -52,11 +69,25 @@ class PaymentListSerializer(serializers.ModelSerializer):
             'id', 'receipt_number', 'student_name', 'course_title',
             'amount', 'payment_date', 'payment_method', 'received_by'
         ]
+    
+    @classmethod
+    def prefetch_queryset(cls, queryset):
+        """Join the enrollment's student and course, loading only listed columns."""
+        return queryset.select_related('enrollment__student', 'enrollment__course').only(
+            'id', 'receipt_number', 'amount', 'payment_date', 'payment_method',
+            'received_by', 'enrollment__student__first_name',
+            'enrollment__student__last_name', 'enrollment__course__title'
+        )
 
 
 class PaymentCreateSerializer(serializers.ModelSerializer):
     """Serializer for creating new payments."""
     
+    # Join the course so validate() can read its price without another query
+    enrollment = serializers.PrimaryKeyRelatedField(
+        queryset=Enrollment.objects.select_related('course')
+    )
+    
     class Meta:
         model = Payment
         fields = [
@@ -103,10 +134,11 @@ class PaymentCreateSerializer(serializers.ModelSerializer):
         # Check if total payments won't exceed course price
         existing_total = Payment.get_total_paid_for_enrollment(enrollment)
         new_total = existing_total + amount
+        course_price = enrollment.course.price
         
-        if new_total > enrollment.course.price:
+        if new_total > course_price:
             raise serializers.ValidationError({
-                'amount': f'Total payments (${new_total}) would exceed course price (${enrollment.course.price}). Outstanding balance: ${enrollment.course.price - existing_total}'
+                'amount': f'Total payments (${new_total}) would exceed course price (${course_price}). Outstanding balance: ${course_price - existing_total}'
             })
         
         return attrs
@@ -172,22 +204,46 @@ class PaymentStatisticsSerializer(serializers.Serializer):
     outstanding_by_student = serializers.ListField()
 
 
-class OutstandingPaymentSerializer(serializers.Serializer):
-    """Serializer for enrollments with outstanding payments."""
+class OutstandingPaymentSerializer(serializers.ModelSerializer):
+    """
+    Serializer for enrollments with outstanding payments; reads the
+    ``_total_paid``, ``_outstanding`` and ``_last_payment_date`` annotations.
+    """
     
-    enrollment_id = serializers.IntegerField()
-    student_id = serializers.IntegerField()
-    student_name = serializers.CharField()
-    student_email = serializers.CharField()
-    student_phone = serializers.CharField()
-    course_id = serializers.IntegerField()
-    course_title = serializers.CharField()
-    enrollment_date = serializers.DateField()
-    course_price = serializers.DecimalField(max_digits=10, decimal_places=2)
-    total_paid = serializers.DecimalField(max_digits=10, decimal_places=2)
-    outstanding_balance = serializers.DecimalField(max_digits=10, decimal_places=2)
-    last_payment_date = serializers.DateField(allow_null=True)
-    days_since_enrollment = serializers.IntegerField()
+    enrollment_id = serializers.IntegerField(source='id', read_only=True)
+    student_id = serializers.IntegerField(read_only=True)
+    student_name = serializers.CharField(source='student.get_full_name', read_only=True)
+    student_email = serializers.CharField(source='student.email', read_only=True)
+    student_phone = serializers.CharField(source='student.phone_number', read_only=True)
+    course_id = serializers.IntegerField(read_only=True)
+    course_title = serializers.CharField(source='course.title', read_only=True)
+    course_price = serializers.DecimalField(
+        source='course.price', max_digits=10, decimal_places=2, read_only=True
+    )
+    total_paid = serializers.DecimalField(
+        source='_total_paid', max_digits=10, decimal_places=2, read_only=True
+    )
+    outstanding_balance = serializers.DecimalField(
+        source='_outstanding', max_digits=10, decimal_places=2, read_only=True
+    )
+    last_payment_date = serializers.DateField(
+        source='_last_payment_date', allow_null=True, read_only=True
+    )
+    days_since_enrollment = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = Enrollment
+        fields = [
+            'enrollment_id', 'student_id', 'student_name', 'student_email',
+            'student_phone', 'course_id', 'course_title', 'enrollment_date',
+            'course_price', 'total_paid', 'outstanding_balance',
+            'last_payment_date', 'days_since_enrollment'
+        ]
+    
+    def get_days_since_enrollment(self, obj):
+        """Get days elapsed since the enrollment date."""
+        today = self.context.get('today') or timezone.now().date()
+        return (today - obj.enrollment_date).days
 
 
 class RevenueReportSerializer(serializers.Serializer):
@@ -211,44 +267,126 @@ class BulkPaymentSerializer(serializers.Serializer):
     )
     
     def validate_payments(self, value):
-        """Validate each payment in the list."""
-        from enrollments.models import Enrollment
-        
+        """Validate each payment and return them as model field values."""
+        required_fields = ['enrollment_id', 'amount', 'payment_method']
+        enrollment_ids = []
         for i, payment_data in enumerate(value):
             # Check required fields
-            required_fields = ['enrollment_id', 'amount', 'payment_method']
             for field in required_fields:
                 if field not in payment_data:
                     raise serializers.ValidationError(
                         f"Payment {i+1}: Missing required field '{field}'"
                     )
-            
-            # Validate enrollment exists
             try:
-                enrollment = Enrollment.objects.get(id=payment_data['enrollment_id'])
-            except Enrollment.DoesNotExist:
+                enrollment_ids.append(int(payment_data['enrollment_id']))
+            except (ValueError, TypeError):
+                enrollment_ids.append(None)
+        
+        today = timezone.now().date()
+        payment_methods = {code for code, _ in Payment.PAYMENT_METHOD_CHOICES}
+        rows = []
+        
+        # Load every referenced enrollment and its paid total in two queries
+        enrollments = Enrollment.objects.select_related('student', 'course').in_bulk(
+            {pk for pk in enrollment_ids if pk is not None}
+        )
+        totals = dict(
+            Payment.objects.filter(
+                enrollment_id__in=enrollments
+            ).order_by().values('enrollment_id').annotate(
+                total=Sum('amount')
+            ).values_list('enrollment_id', 'total')
+        )
+        
+        for i, (payment_data, enrollment_id) in enumerate(zip(value, enrollment_ids)):
+            # Validate enrollment exists
+            enrollment = enrollments.get(enrollment_id)
+            if enrollment is None:
                 raise serializers.ValidationError(
                     f"Payment {i+1}: Enrollment {payment_data['enrollment_id']} does not exist"
                 )
             
             # Validate amount
             try:
-                amount = Decimal(str(payment_data['amount']))
-                if amount <= 0:
+                amount = to_decimal(payment_data['amount'])
+                if amount <= 0 or amount != amount.quantize(CENT):
                     raise ValueError()
-            except (ValueError, TypeError):
+            except (ValueError, TypeError, ArithmeticError):
                 raise serializers.ValidationError(
                     f"Payment {i+1}: Invalid amount"
                 )
             
-            # Check if total won't exceed course price
-            existing_total = Payment.get_total_paid_for_enrollment(enrollment)
+            # Validate payment method
+            if payment_data['payment_method'] not in payment_methods:
+                raise serializers.ValidationError(
+                    f"Payment {i+1}: Invalid payment method"
+                )
+            
+            # Validate payment date (defaults to today)
+            payment_date = payment_data.get('payment_date') or today
+            if isinstance(payment_date, str):
+                try:
+                    payment_date = parse_date(payment_date)
+                except ValueError:
+                    # Well formed but impossible, e.g. 2025-02-30
+                    payment_date = None
+            if not isinstance(payment_date, date):
+                raise serializers.ValidationError(
+                    f"Payment {i+1}: Invalid payment date"
+                )
+            if payment_date > today:
+                raise serializers.ValidationError(
+                    f"Payment {i+1}: Payment date cannot be in the future"
+                )
+            if payment_date < enrollment.enrollment_date:
+                raise serializers.ValidationError(
+                    f"Payment {i+1}: Payment date cannot be before enrollment date"
+                )
+            
+            # Check if total won't exceed course price, counting earlier
+            # payments in this batch for the same enrollment
+            existing_total = totals.get(enrollment.id) or Decimal('0.00')
             if existing_total + amount > enrollment.course.price:
                 raise serializers.ValidationError(
                     f"Payment {i+1}: Total would exceed course price"
                 )
+            totals[enrollment.id] = existing_total + amount
+            
+            # Notes are optional, but the column is NOT NULL
+            notes = payment_data.get('notes', '')
+            if not isinstance(notes, str):
+                raise serializers.ValidationError(
+                    f"Payment {i+1}: Notes must be a string"
+                )
+            
+            rows.append({
+                'enrollment': enrollment,
+                'amount': amount,
+                'payment_method': payment_data['payment_method'],
+                'payment_date': payment_date,
+                'notes': notes
+            })
         
-        return value
+        return rows
+    
+    def create(self, validated_data):
+        """Insert the validated payments with bulk_create."""
+        rows = validated_data['payments']
+        received_by = validated_data.get('received_by')
+        
+        with transaction.atomic():
+            receipt_numbers = Payment.generate_receipt_numbers(len(rows))
+            payments = Payment.objects.bulk_create(
+                [
+                    Payment(received_by=received_by, receipt_number=receipt_number, **row)
+                    for row, receipt_number in zip(rows, receipt_numbers)
+                ],
+                batch_size=settings.PAYMENT_BULK_BATCH_SIZE
+            )
+        
+        # bulk_create sends no post_save, so invalidate the statistics here
+        Payment.invalidate_statistics_cache()
+        return payments
 
 
 class StudentPaymentSerializer(serializers.ModelSerializer):
@@ -261,7 +399,13 @@ class StudentPaymentSerializer(serializers.ModelSerializer):
         decimal_places=2,
         read_only=True
     )
-    remaining_balance = serializers.SerializerMethodField()
+    remaining_balance = serializers.DecimalField(
+        source='get_remaining_balance',
+        max_digits=10,
+        decimal_places=2,
+        coerce_to_string=False,
+        read_only=True
+    )
     
     class Meta:
         model = Payment
@@ -271,6 +415,7 @@ class StudentPaymentSerializer(serializers.ModelSerializer):
             'remaining_balance', 'notes', 'created_at'
         ]
     
-    def get_remaining_balance(self, obj):
-        """Get remaining balance after this payment."""
-        return obj.get_remaining_balance()
\ No newline at end of file
+    @classmethod
+    def prefetch_queryset(cls, queryset):
+        """Join the enrollment's course and annotate balances."""
+        return queryset.with_paid_to_date().select_related('enrollment__course')
\ No newline at end of file
@@ -2,10 +2,13 @@
 Signal handlers for payment-related events.
 """
 
-from django.db.models.signals import post_save, pre_delete
+import logging
+from django.db.models.signals import post_save, post_delete, pre_delete
 from django.dispatch import receiver
 from .models import Payment
 
+logger = logging.getLogger(__name__)
+
 
 @receiver(post_save, sender=Payment)
 def payment_created_handler(sender, instance, created, **kwargs):
@@ -14,7 +17,7 @@ def payment_created_handler(sender, instance, created, **kwargs):
     """
     if created:
         # Log payment creation
-        print(f"Payment created: {instance.receipt_number} - ${instance.amount}")
+        logger.info("Payment created: %s - $%s", instance.receipt_number, instance.amount)
         
         # TODO: Send payment confirmation email
         # from .utils import send_payment_confirmation_email
@@ -22,7 +25,7 @@ def payment_created_handler(sender, instance, created, **kwargs):
         
         # TODO: Check if enrollment is now fully paid and trigger notifications
         # if Payment.is_enrollment_fully_paid(instance.enrollment):
-        #     print(f"Enrollment {instance.enrollment.id} is now fully paid!")
+        #     logger.info("Enrollment %s is now fully paid", instance.enrollment_id)
 
 
 @receiver(pre_delete, sender=Payment)
@@ -31,6 +34,15 @@ def payment_delete_handler(sender, instance, **kwargs):
     Handle actions before a payment is deleted.
     """
     # Log payment deletion
-    print(f"Payment being deleted: {instance.receipt_number} - ${instance.amount}")
+    logger.info("Payment being deleted: %s - $%s", instance.receipt_number, instance.amount)
     
-    # TODO: Add any cleanup or notification logic here
\ No newline at end of file
+    # TODO: Add any cleanup or notification logic here
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def invalidate_statistics_cache(sender, instance, **kwargs):
+    """
+    Invalidate the cached payment statistics whenever a payment changes.
+    """
+    Payment.invalidate_statistics_cache()
\ No newline at end of file
@@ -1,21 +1,32 @@
+from datetime import timedelta
+from django.core.cache import cache
 from django.test import TestCase
 from django.utils import timezone
 from decimal import Decimal
 from django.core.exceptions import ValidationError
+from rest_framework.test import APIClient
 
 from accounts.models import User
 from courses.models import Course, Category
 from enrollments.models import Enrollment
 from .models import Payment
+from .serializers import BulkPaymentSerializer
+from .utils import (
+    bulk_payment_validation, calculate_enrollment_payment_status,
+    get_overdue_payments, get_payment_completion_rate,
+    get_payment_method_statistics, get_payment_trends,
+    get_revenue_by_period, get_student_payment_summary
+)
 
 
-class PaymentModelTest(TestCase):
-    """Test cases for Payment model."""
+class PaymentTestCase(TestCase):
+    """Shared users, course and enrollment for the payment tests."""
     
-    def setUp(self):
+    @classmethod
+    def setUpTestData(cls):
         """Set up test data."""
         # Create users
-        self.admin = User.objects.create_user(
+        cls.admin = User.objects.create_user(
             username='admin',
             email='admin@test.com',
             password='testpass123',
@@ -24,7 +35,7 @@ class PaymentModelTest(TestCase):
             role='ADMIN'
         )
         
-        self.finance_staff = User.objects.create_user(
+        cls.finance_staff = User.objects.create_user(
             username='finance',
             email='finance@test.com',
             password='testpass123',
@@ -33,7 +44,7 @@ class PaymentModelTest(TestCase):
             role='FINANCE'
         )
         
-        self.student = User.objects.create_user(
+        cls.student = User.objects.create_user(
             username='student',
             email='student@test.com',
             password='testpass123',
@@ -43,27 +54,31 @@ class PaymentModelTest(TestCase):
         )
         
         # Create category and course
-        self.category = Category.objects.create(
+        cls.category = Category.objects.create(
             name='Programming',
             description='Programming courses'
         )
         
-        self.course = Course.objects.create(
+        cls.course = Course.objects.create(
             title='Python Basics',
             description='Learn Python programming',
             duration=40,
             price=Decimal('1000.00'),
             level='BEGINNER',
-            category=self.category,
-            created_by=self.admin
+            category=cls.category,
+            created_by=cls.admin
         )
         
         # Create enrollment
-        self.enrollment = Enrollment.objects.create(
-            student=self.student,
-            course=self.course,
+        cls.enrollment = Enrollment.objects.create(
+            student=cls.student,
+            course=cls.course,
             enrollment_date=timezone.now().date()
         )
+
+
+class PaymentModelTest(PaymentTestCase):
+    """Test cases for Payment model."""
     
     def test_payment_creation(self):
         """Test creating a valid payment."""
@@ -89,6 +104,27 @@ class PaymentModelTest(TestCase):
         
         self.assertTrue(payment.receipt_number.startswith('RCP-'))
     
+    def test_rejected_payment_keeps_receipt_sequence(self):
+        """Test a payment failing validation does not use up a receipt number."""
+        def create(amount):
+            return Payment.objects.create(
+                enrollment=self.enrollment,
+                amount=Decimal(amount),
+                payment_date=timezone.now().date(),
+                payment_method='CASH',
+                received_by=self.finance_staff
+            )
+        
+        first = create('100.00')
+        with self.assertRaises(ValidationError):
+            create('5000.00')
+        second = create('100.00')
+        
+        first_value, second_value = (
+            int(p.receipt_number.rsplit('-', 1)[1]) for p in (first, second)
+        )
+        self.assertEqual(second_value, first_value + 1)
+    
     def test_payment_exceeds_course_price(self):
         """Test that payment cannot exceed course price."""
         # First payment
@@ -151,6 +187,49 @@ class PaymentModelTest(TestCase):
         outstanding = Payment.get_outstanding_balance(self.enrollment)
         self.assertEqual(outstanding, Decimal('400.00'))
     
+    def test_outstanding_balance_uses_annotation(self):
+        """Test balance helpers read annotated totals without querying."""
+        Payment.objects.create(
+            enrollment=self.enrollment,
+            amount=Decimal('250.00'),
+            payment_date=timezone.now().date(),
+            payment_method='CASH',
+            received_by=self.finance_staff
+        )
+        
+        enrollment = Enrollment.objects.with_payment_totals().select_related(
+            'course'
+        ).get(pk=self.enrollment.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(Payment.get_outstanding_balance(enrollment), Decimal('750.00'))
+            self.assertFalse(Payment.is_enrollment_fully_paid(enrollment))
+    
+    def test_remaining_balance_annotation(self):
+        """Test annotated paid-to-date totals match the per-payment query."""
+        today = timezone.now().date()
+        self.enrollment.enrollment_date = today - timedelta(days=5)
+        self.enrollment.save(update_fields=['enrollment_date'])
+        for days, amount in ((2, '100.00'), (1, '200.00')):
+            Payment.objects.create(
+                enrollment=self.enrollment,
+                amount=Decimal(amount),
+                payment_date=today - timedelta(days=days),
+                payment_method='CASH',
+                received_by=self.finance_staff
+            )
+        
+        payments = Payment.objects.with_paid_to_date().select_related(
+            'enrollment__course'
+        ).order_by('payment_date')
+        with self.assertNumQueries(1):
+            balances = [p.get_remaining_balance() for p in payments]
+        
+        self.assertEqual(balances, [Decimal('900.00'), Decimal('700.00')])
+        self.assertEqual(
+            balances,
+            [p.get_remaining_balance() for p in Payment.objects.order_by('payment_date')]
+        )
+    
     def test_is_enrollment_fully_paid(self):
         """Test checking if enrollment is fully paid."""
         # Not fully paid
@@ -169,4 +248,446 @@ class PaymentModelTest(TestCase):
             payment_method='CASH',
             received_by=self.finance_staff
         )
-        self.assertTrue(Payment.is_enrollment_fully_paid(self.enrollment))
\ No newline at end of file
+        self.assertTrue(Payment.is_enrollment_fully_paid(self.enrollment))
+
+
+class BulkPaymentTest(PaymentTestCase):
+    """Test cases for validating and recording bulk payments."""
+    
+    def test_bulk_payment_validation(self):
+        """Test bulk validation batches lookups and counts earlier rows."""
+        def row(amount):
+            return {
+                'enrollment_id': self.enrollment.id,
+                'amount': amount,
+                'payment_method': 'CASH'
+            }
+        
+        serializer = BulkPaymentSerializer(data={'payments': [row('600'), row('300')]})
+        with self.assertNumQueries(2):
+            self.assertTrue(serializer.is_valid())
+        
+        serializer = BulkPaymentSerializer(data={'payments': [row('600'), row('500')]})
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('Payment 2', str(serializer.errors['payments'][0]))
+        
+        for amount in ('10.005', 'abc', 'Infinity'):
+            serializer = BulkPaymentSerializer(data={'payments': [row(amount)]})
+            self.assertFalse(serializer.is_valid())
+        
+        is_valid, errors = bulk_payment_validation([row('abc'), row('10.005'), row('10.50')])
+        self.assertFalse(is_valid)
+        self.assertEqual([error['index'] for error in errors], [0, 1])
+    
+    def test_bulk_payment_create(self):
+        """Test bulk payments are inserted together with consecutive receipts."""
+        serializer = BulkPaymentSerializer(data={'payments': [
+            {'enrollment_id': self.enrollment.id, 'amount': '100', 'payment_method': 'CASH'},
+            {'enrollment_id': self.enrollment.id, 'amount': '200', 'payment_method': 'CARD'},
+        ]})
+        self.assertTrue(serializer.is_valid())
+        created = serializer.save(received_by=self.finance_staff)
+        
+        self.assertEqual(len(created), 2)
+        self.assertEqual(Payment.get_total_paid_for_enrollment(self.enrollment), Decimal('300.00'))
+        first, second = [int(p.receipt_number.rsplit('-', 1)[1]) for p in created]
+        self.assertEqual(second, first + 1)
+    
+    def test_bulk_payment_rejects_bad_rows(self):
+        """Test malformed bulk rows fail validation instead of the insert."""
+        base = {'enrollment_id': self.enrollment.id, 'amount': '100', 'payment_method': 'CASH'}
+        for extra in (
+            {'payment_date': '2025-02-30'},
+            {'notes': None},
+            {'payment_method': 'BOGUS'},
+        ):
+            serializer = BulkPaymentSerializer(data={'payments': [dict(base, **extra)]})
+            self.assertFalse(serializer.is_valid())
+            self.assertIn('Payment 1', str(serializer.errors['payments'][0]))
+        self.assertFalse(Payment.objects.exists())
+
+
+class PaymentUtilsTest(PaymentTestCase):
+    """Test cases for payment reporting utilities."""
+    
+    def test_enrollment_payment_status(self):
+        """Test payment status totals and dates come from one query."""
+        today = timezone.now().date()
+        for amount in ('300.00', '200.00'):
+            Payment.objects.create(
+                enrollment=self.enrollment,
+                amount=Decimal(amount),
+                payment_date=today,
+                payment_method='CASH',
+                received_by=self.finance_staff
+            )
+        
+        with self.assertNumQueries(1):
+            status = calculate_enrollment_payment_status(self.enrollment)
+        self.assertEqual(status['total_paid'], Decimal('500.00'))
+        self.assertEqual(status['outstanding_balance'], Decimal('500.00'))
+        self.assertEqual(status['payment_count'], 2)
+        self.assertEqual(status['first_payment_date'], today)
+        self.assertEqual(status['last_payment_date'], today)
+        self.assertEqual(status['percentage_paid'], Decimal('50.00'))
+    
+    def test_student_payment_summary(self):
+        """Test the student summary reads every enrollment's total in one query."""
+        Payment.objects.create(
+            enrollment=self.enrollment,
+            amount=Decimal('250.00'),
+            payment_date=timezone.now().date(),
+            payment_method='CASH',
+            received_by=self.finance_staff
+        )
+        
+        with self.assertNumQueries(1):
+            summary = get_student_payment_summary(self.student)
+        self.assertEqual(summary['total_enrollments'], 1)
+        self.assertEqual(summary['total_paid'], Decimal('250.00'))
+        self.assertEqual(summary['total_outstanding'], Decimal('750.00'))
+        self.assertEqual(summary['partially_paid_enrollments'], 1)
+    
+    def test_daily_revenue_by_period(self):
+        """Test daily revenue is grouped in one query with empty days filled in."""
+        today = timezone.now().date()
+        self.enrollment.enrollment_date = today - timedelta(days=5)
+        self.enrollment.save(update_fields=['enrollment_date'])
+        for days_ago, amount in ((2, '100.00'), (2, '50.00'), (0, '25.00')):
+            Payment.objects.create(
+                enrollment=self.enrollment,
+                amount=Decimal(amount),
+                payment_date=today - timedelta(days=days_ago),
+                payment_method='CASH',
+                received_by=self.finance_staff
+            )
+        
+        with self.assertNumQueries(1):
+            data = get_revenue_by_period(today - timedelta(days=3), today)
+        self.assertEqual([row['revenue'] for row in data], [
+            Decimal('0.00'), Decimal('150.00'), Decimal('0.00'), Decimal('25.00')
+        ])
+        self.assertEqual([row['payment_count'] for row in data], [0, 2, 0, 1])
+    
+    def test_overdue_payments(self):
+        """Test overdue enrollments are filtered on their balance in SQL."""
+        today = timezone.now().date()
+        self.enrollment.enrollment_date = today - timedelta(days=40)
+        self.enrollment.save(update_fields=['enrollment_date'])
+        Payment.objects.create(
+            enrollment=self.enrollment,
+            amount=Decimal('400.00'),
+            payment_date=today,
+            payment_method='CASH',
+            received_by=self.finance_staff
+        )
+        
+        with self.assertNumQueries(1):
+            overdue = get_overdue_payments(days_threshold=30)
+        self.assertEqual(len(overdue), 1)
+        self.assertEqual(overdue[0]['outstanding_balance'], Decimal('600.00'))
+        self.assertEqual(overdue[0]['days_overdue'], 40)
+        
+        Payment.objects.create(
+            enrollment=self.enrollment,
+            amount=Decimal('600.00'),
+            payment_date=today,
+            payment_method='CASH',
+            received_by=self.finance_staff
+        )
+        self.assertEqual(get_overdue_payments(days_threshold=30), [])
+    
+    def test_payment_completion_rate(self):
+        """Test enrollments are bucketed by paid total in one query."""
+        other_student = User.objects.create_user(
+            username='student2',
+            email='student2@test.com',
+            password='testpass123',
+            role='STUDENT'
+        )
+        other_enrollment = Enrollment.objects.create(
+            student=other_student,
+            course=self.course,
+            enrollment_date=timezone.now().date()
+        )
+        for enrollment, amount in ((self.enrollment, '1000.00'), (other_enrollment, '10.00')):
+            Payment.objects.create(
+                enrollment=enrollment,
+                amount=Decimal(amount),
+                payment_date=timezone.now().date(),
+                payment_method='CASH',
+                received_by=self.finance_staff
+            )
+        
+        with self.assertNumQueries(1):
+            rate = get_payment_completion_rate()
+        self.assertEqual(rate['total_enrollments'], 2)
+        self.assertEqual(rate['fully_paid'], 1)
+        self.assertEqual(rate['partially_paid'], 1)
+        self.assertEqual(rate['unpaid'], 0)
+        self.assertEqual(rate['completion_rate'], 50.0)
+    
+    def test_payment_method_statistics(self):
+        """Test per-method statistics come from one grouped query."""
+        for amount, method in (('300.00', 'CASH'), ('100.00', 'CASH'), ('100.00', 'CARD')):
+            Payment.objects.create(
+                enrollment=self.enrollment,
+                amount=Decimal(amount),
+                payment_date=timezone.now().date(),
+                payment_method=method,
+                received_by=self.finance_staff
+            )
+        
+        with self.assertNumQueries(1):
+            stats = get_payment_method_statistics()
+        self.assertEqual([m['method_code'] for m in stats], ['CASH', 'CARD'])
+        self.assertEqual(stats[0]['total_revenue'], Decimal('400.00'))
+        self.assertEqual(stats[0]['payment_count'], 2)
+        self.assertEqual(stats[0]['percentage_of_total'], 80)
+    
+    def test_payment_trends(self):
+        """Test payment trends are derived from one grouped count query."""
+        today = timezone.now().date()
+        self.enrollment.enrollment_date = today - timedelta(days=10)
+        self.enrollment.save(update_fields=['enrollment_date'])
+        for days_ago in (8, 1, 0):
+            Payment.objects.create(
+                enrollment=self.enrollment,
+                amount=Decimal('10.00'),
+                payment_date=today - timedelta(days=days_ago),
+                payment_method='CASH',
+                received_by=self.finance_staff
+            )
+        
+        with self.assertNumQueries(1):
+            trends = get_payment_trends(days=10)
+        self.assertEqual(trends['total_payments'], 3)
+        self.assertEqual(trends['first_half_count'], 1)
+        self.assertEqual(trends['second_half_count'], 2)
+        self.assertEqual(trends['trend'], 'increasing')
+        self.assertEqual(trends['daily_counts'][today.strftime('%Y-%m-%d')], 1)
+        self.assertEqual(len(trends['daily_counts']), 11)
+
+
+class PaymentAPITest(PaymentTestCase):
+    """Test cases for Payment API endpoints."""
+    
+    def test_export_csv(self):
+        """Test streaming the payment CSV export."""
+        Payment.objects.create(
+            enrollment=self.enrollment,
+            amount=Decimal('150.00'),
+            payment_date=timezone.now().date(),
+            payment_method='CASH',
+            received_by=self.finance_staff
+        )
+        client = APIClient()
+        client.force_authenticate(user=self.finance_staff)
+        
+        response = client.get('/api/payments/admin/payments/export/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].startswith('Receipt Number,Student Name'))
+        self.assertIn('Test Student,student@test.com,Python Basics,150.00', lines[1])
+        self.assertIn('Cash,Finance Staff', lines[1])
+    
+    def test_outstanding_endpoint(self):
+        """Test outstanding balances are filtered, ordered and paged in SQL."""
+        today = timezone.now().date()
+        Payment.objects.create(
+            enrollment=self.enrollment,
+            amount=Decimal('400.00'),
+            payment_date=today,
+            payment_method='CASH',
+            received_by=self.finance_staff
+        )
+        client = APIClient()
+        client.force_authenticate(user=self.finance_staff)
+        
+        # Cursor pagination needs no COUNT, just the page query
+        with self.assertNumQueries(1):
+            response = client.get('/api/payments/admin/payments/outstanding/')
+        self.assertEqual(response.status_code, 200)
+        
+        rows = response.json()['results']
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['total_paid'], '400.00')
+        self.assertEqual(rows[0]['outstanding_balance'], '600.00')
+        self.assertEqual(rows[0]['last_payment_date'], today.isoformat())
+        self.assertEqual(rows[0]['student_name'], 'Test Student')
+        self.assertEqual(rows[0]['course_price'], '1000.00')
+        self.assertEqual(rows[0]['days_since_enrollment'], 0)
+    
+    def test_outstanding_cursor_pagination(self):
+        """Test outstanding pages are walked by cursor, highest balance first."""
+        for title, price in (('Django', '3000.00'), ('SQL', '2000.00')):
+            course = Course.objects.create(
+                title=title,
+                description=title,
+                duration=10,
+                price=Decimal(price),
+                level='BEGINNER',
+                category=self.category,
+                created_by=self.admin
+            )
+            Enrollment.objects.create(
+                student=self.student,
+                course=course,
+                enrollment_date=timezone.now().date()
+            )
+        client = APIClient()
+        client.force_authenticate(user=self.finance_staff)
+        
+        balances = []
+        url = '/api/payments/admin/payments/outstanding/?page_size=2'
+        while url:
+            data = client.get(url).json()
+            self.assertNotIn('count', data)
+            balances.extend(row['outstanding_balance'] for row in data['results'])
+            url = data['next']
+        
+        self.assertEqual(balances, ['3000.00', '2000.00', '1000.00'])
+    
+    def test_reports_endpoint(self):
+        """Test the revenue report groups methods and days in single queries."""
+        cache.clear()
+        today = timezone.now().date()
+        self.enrollment.enrollment_date = today - timedelta(days=5)
+        self.enrollment.save(update_fields=['enrollment_date'])
+        for days_ago, method in ((2, 'CASH'), (2, 'CARD'), (0, 'CASH')):
+            Payment.objects.create(
+                enrollment=self.enrollment,
+                amount=Decimal('100.00'),
+                payment_date=today - timedelta(days=days_ago),
+                payment_method=method,
+                received_by=self.finance_staff
+            )
+        client = APIClient()
+        client.force_authenticate(user=self.finance_staff)
+        
+        start = (today - timedelta(days=3)).isoformat()
+        url = f'/api/payments/admin/payments/reports/?start_date={start}&end_date={today.isoformat()}'
+        with self.assertNumQueries(4):
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        
+        data = response.json()
+        self.assertEqual(data['by_method'], {'CASH': 200.0, 'CARD': 100.0})
+        self.assertEqual(
+            [day['revenue'] for day in data['daily_breakdown']],
+            [0.0, 200.0, 0.0, 100.0]
+        )
+        
+        # Repeat requests are served from cache until a payment changes
+        with self.assertNumQueries(0):
+            self.assertEqual(client.get(url).json(), data)
+        Payment.objects.create(
+            enrollment=self.enrollment,
+            amount=Decimal('100.00'),
+            payment_date=today,
+            payment_method='CARD',
+            received_by=self.finance_staff
+        )
+        self.assertEqual(client.get(url).json()['payment_count'], 4)
+        
+        response = client.get('/api/payments/admin/payments/reports/?start_date=01/02/2025')
+        self.assertEqual(response.status_code, 400)
+    
+    def test_statistics_cached_until_payment_changes(self):
+        """Test statistics are served from cache and refreshed on payment writes."""
+        cache.clear()
+        client = APIClient()
+        client.force_authenticate(user=self.finance_staff)
+        url = '/api/payments/admin/payments/statistics/'
+        
+        self.assertEqual(client.get(url).json()['total_payments'], 0)
+        with self.assertNumQueries(0):
+            client.get(url)
+        
+        Payment.objects.create(
+            enrollment=self.enrollment,
+            amount=Decimal('100.00'),
+            payment_date=timezone.now().date(),
+            payment_method='CASH',
+            received_by=self.finance_staff
+        )
+        data = client.get(url).json()
+        self.assertEqual(data['total_payments'], 1)
+        self.assertEqual(len(data['revenue_by_month']), 12)
+        self.assertEqual(data['revenue_by_month'][-1], {
+            'month': timezone.now().date().strftime('%Y-%m'),
+            'revenue': 100.0
+        })
+        self.assertEqual(data['revenue_this_month'], '100.00')
+        self.assertEqual(data['revenue_this_year'], '100.00')
+        self.assertEqual(
+            [row['student_id'] for row in data['outstanding_by_student']],
+            [self.student.id]
+        )
+        
+        # Users who no longer have the STUDENT role drop out of the ranking
+        # but their balances still count towards total_outstanding
+        self.student.role = 'REGISTRAR'
+        self.student.save(update_fields=['role'])
+        data = client.get(url).json()
+        self.assertEqual(data['outstanding_by_student'], [])
+        self.assertEqual(data['total_outstanding'], '900.00')
+        self.student.role = 'STUDENT'
+        self.student.save(update_fields=['role'])
+        
+        # Logins leave the cache alone; renames refresh it
+        client.get(url)
+        self.student.save(update_fields=['last_login'])
+        with self.assertNumQueries(0):
+            client.get(url)
+        self.student.first_name = 'Renamed'
+        self.student.save()
+        self.assertEqual(
+            client.get(url).json()['outstanding_by_student'][0]['student_name'],
+            'Renamed Student'
+        )
+        self.student.first_name = 'Test'
+        self.student.save()
+        data = client.get(url).json()
+        self.assertEqual(data['top_paying_students'], [{
+            'student_id': self.student.id,
+            'student_name': 'Test Student',
+            'total_paid': 100.0
+        }])
+        
+        serializer = BulkPaymentSerializer(data={'payments': [
+            {'enrollment_id': self.enrollment.id, 'amount': '50', 'payment_method': 'CARD'},
+        ]})
+        self.assertTrue(serializer.is_valid())
+        serializer.save(received_by=self.finance_staff)
+        self.assertEqual(client.get(url).json()['total_payments'], 2)
+    
+    def test_student_summary_endpoint(self):
+        """Test the student summary loads enrollments and payments in two queries."""
+        today = timezone.now().date()
+        for amount in ('300.00', '200.00'):
+            Payment.objects.create(
+                enrollment=self.enrollment,
+                amount=Decimal(amount),
+                payment_date=today,
+                payment_method='CASH',
+                received_by=self.finance_staff
+            )
+        client = APIClient()
+        client.force_authenticate(user=self.student)
+        
+        with self.assertNumQueries(2):
+            response = client.get('/api/payments/student/payments/summary/')
+        self.assertEqual(response.status_code, 200)
+        
+        data = response.json()
+        self.assertEqual(data['partially_paid_enrollments'], 1)
+        row = data['by_enrollment'][0]
+        self.assertEqual(row['total_paid'], '500.00')
+        self.assertEqual(row['payment_count'], 2)
+        self.assertEqual(row['last_payment_date'], today.isoformat())
+        self.assertEqual(len(row['payments']), 2)
+        self.assertEqual(row['payments'][0]['student_name'], 'Test Student')
\ No newline at end of file
@@ -2,11 +2,38 @@
 Utility functions for payment management.
 """
 
-from decimal import Decimal
-from django.db.models import Sum, Count, Avg
+from decimal import Decimal, ROUND_HALF_UP
+from django.db.models import F, Q, Sum, Count, Avg, Min, Max
 from django.utils import timezone
 from django.conf import settings
 from datetime import timedelta
+from django.db.models.functions import TruncMonth
+from enrollments.models import Enrollment
+from .models import Payment
+
+# Smallest amount a payment can be split into
+CENT = Decimal('0.01')
+
+
+def to_decimal(value):
+    """
+    Convert a raw amount to Decimal, skipping the str() round trip when possible.
+    
+    Args:
+        value: Decimal, int, str or float amount
+    
+    Returns:
+        Decimal: The amount; raises TypeError, ValueError or ArithmeticError
+        for values that are not numbers
+    """
+    if isinstance(value, Decimal):
+        return value
+    if isinstance(value, bool):
+        raise TypeError("Boolean is not a valid amount")
+    if isinstance(value, (int, str)):
+        return Decimal(value)
+    # Floats go through str() so 0.1 stays 0.1 rather than its binary expansion
+    return Decimal(str(value))
 
 
 def calculate_enrollment_payment_status(enrollment):
@@ -19,27 +46,29 @@ def calculate_enrollment_payment_status(enrollment):
     Returns:
         dict: Payment status details
     """
-    from .models import Payment
-    
     course_price = enrollment.course.price
-    total_paid = Payment.get_total_paid_for_enrollment(enrollment)
-    outstanding = course_price - total_paid
     
-    payments = Payment.objects.filter(enrollment=enrollment).order_by('payment_date')
-    payment_count = payments.count()
-    
-    last_payment = payments.last()
-    first_payment = payments.first()
+    # Total, count and date range in one query
+    stats = Payment.objects.filter(enrollment=enrollment).aggregate(
+        total=Sum('amount'),
+        count=Count('id'),
+        first_date=Min('payment_date'),
+        last_date=Max('payment_date')
+    )
+    total_paid = stats['total'] or Decimal('0.00')
+    outstanding = course_price - total_paid
     
     return {
         'course_price': course_price,
         'total_paid': total_paid,
         'outstanding_balance': max(outstanding, Decimal('0.00')),
         'is_fully_paid': outstanding <= 0,
-        'payment_count': payment_count,
-        'first_payment_date': first_payment.payment_date if first_payment else None,
-        'last_payment_date': last_payment.payment_date if last_payment else None,
-        'percentage_paid': round((total_paid / course_price * 100), 2) if course_price > 0 else 0
+        'payment_count': stats['count'],
+        'first_payment_date': stats['first_date'],
+        'last_payment_date': stats['last_date'],
+        'percentage_paid': (total_paid / course_price * 100).quantize(
+            CENT, rounding=ROUND_HALF_UP
+        ) if course_price > 0 else 0
     }
 
 
@@ -53,11 +82,12 @@ def get_student_payment_summary(student):
     Returns:
         dict: Student's payment summary
     """
-    from enrollments.models import Enrollment
-    from .models import Payment
-    
-    enrollments = Enrollment.objects.filter(student=student)
+    # Paid totals come from the annotation, so the loop issues no queries
+    enrollments = Enrollment.objects.filter(
+        student=student
+    ).with_payment_totals().select_related('course')
     
+    total_enrollments = 0
     total_course_fees = Decimal('0.00')
     total_paid = Decimal('0.00')
     fully_paid_count = 0
@@ -65,6 +95,7 @@ def get_student_payment_summary(student):
     unpaid_count = 0
     
     for enrollment in enrollments:
+        total_enrollments += 1
         course_price = enrollment.course.price
         total_course_fees += course_price
         
@@ -79,7 +110,7 @@ def get_student_payment_summary(student):
             unpaid_count += 1
     
     return {
-        'total_enrollments': enrollments.count(),
+        'total_enrollments': total_enrollments,
         'total_course_fees': total_course_fees,
         'total_paid': total_paid,
         'total_outstanding': total_course_fees - total_paid,
@@ -102,7 +133,6 @@ def generate_payment_receipt_data(payment):
     enrollment = payment.enrollment
     remaining_balance = payment.get_remaining_balance()
     
-    from .models import Payment
     total_paid = Payment.get_total_paid_for_enrollment(enrollment)
     
     return {
@@ -134,26 +164,30 @@ def get_revenue_by_period(start_date, end_date, group_by='day'):
     Returns:
         list: Revenue data grouped by period
     """
-    from .models import Payment
-    from django.db.models.functions import TruncMonth, TruncDay
-    
     payments = Payment.objects.filter(
         payment_date__gte=start_date,
         payment_date__lte=end_date
     )
     
     if group_by == 'day':
+        # payment_date is already a date, so group on it directly
+        daily = {
+            row['payment_date']: row
+            for row in payments.order_by().values('payment_date').annotate(
+                revenue=Sum('amount'),
+                payment_count=Count('id')
+            )
+        }
+        
+        # Fill in days without payments
         revenue_data = []
         current_date = start_date
         while current_date <= end_date:
-            daily_revenue = payments.filter(
-                payment_date=current_date
-            ).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-            
+            row = daily.get(current_date)
             revenue_data.append({
                 'date': current_date,
-                'revenue': daily_revenue,
-                'payment_count': payments.filter(payment_date=current_date).count()
+                'revenue': row['revenue'] if row else Decimal('0.00'),
+                'payment_count': row['payment_count'] if row else 0
             })
             current_date += timedelta(days=1)
         
@@ -183,33 +217,29 @@ def get_overdue_payments(days_threshold=30):
     Returns:
         list: Overdue payment information
     """
-    from enrollments.models import Enrollment
-    from .models import Payment
-    
-    threshold_date = timezone.now().date() - timedelta(days=days_threshold)
+    today = timezone.now().date()
+    threshold_date = today - timedelta(days=days_threshold)
     
-    # Get enrollments older than threshold with outstanding balance
+    # Get enrollments older than threshold with outstanding balance; the
+    # balance check runs in SQL against the paid total annotation
     enrollments = Enrollment.objects.filter(
         enrollment_date__lte=threshold_date,
         status__in=['IN_PROGRESS', 'COMPLETED']
+    ).with_payment_totals().filter(
+        _total_paid__lt=F('course__price')
     ).select_related('student', 'course')
     
     overdue_list = []
     
     for enrollment in enrollments:
-        outstanding = Payment.get_outstanding_balance(enrollment)
-        
-        if outstanding > 0:
-            days_overdue = (timezone.now().date() - enrollment.enrollment_date).days
-            
-            overdue_list.append({
-                'enrollment': enrollment,
-                'student': enrollment.student,
-                'course': enrollment.course,
-                'outstanding_balance': outstanding,
-                'days_overdue': days_overdue,
-                'enrollment_date': enrollment.enrollment_date
-            })
+        overdue_list.append({
+            'enrollment': enrollment,
+            'student': enrollment.student,
+            'course': enrollment.course,
+            'outstanding_balance': Payment.get_outstanding_balance(enrollment),
+            'days_overdue': (today - enrollment.enrollment_date).days,
+            'enrollment_date': enrollment.enrollment_date
+        })
     
     return overdue_list
 
@@ -251,8 +281,6 @@ def validate_payment_amount(enrollment, amount):
     Returns:
         tuple: (is_valid, error_message)
     """
-    from .models import Payment
-    
     if amount <= 0:
         return False, "Payment amount must be greater than zero"
     
@@ -275,8 +303,6 @@ def get_payment_statistics(start_date=None, end_date=None):
     Returns:
         dict: Payment statistics
     """
-    from .models import Payment
-    
     queryset = Payment.objects.all()
     
     if start_date:
@@ -290,15 +316,8 @@ def get_payment_statistics(start_date=None, end_date=None):
         average_payment=Avg('amount')
     )
     
-    # Revenue by payment method
-    by_method = {}
-    for method, _ in Payment.PAYMENT_METHOD_CHOICES:
-        method_total = queryset.filter(
-            payment_method=method
-        ).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-        
-        if method_total > 0:
-            by_method[method] = method_total
+    # Revenue by payment method, from one GROUP BY
+    by_method = Payment.get_revenue_summary(start_date, end_date)['by_method']
     
     return {
         'total_revenue': stats['total_revenue'] or Decimal('0.00'),
@@ -355,8 +374,6 @@ def send_payment_reminder_email(enrollment):
     Returns:
         bool: Success status
     """
-    from .models import Payment
-    
     outstanding = Payment.get_outstanding_balance(enrollment)
     
     if outstanding <= 0:
@@ -386,25 +403,24 @@ def send_payment_reminder_email(enrollment):
     return True
 
 
-def export_payment_report_csv(payments, filename='payment_report.csv'):
+def iter_payment_report_rows(payments, chunk_size=2000):
     """
-    Export payment data to CSV format.
+    Yield the payment report as CSV rows, starting with the header.
+    
+    Rows are read as plain tuples in chunks, so memory stays bounded
+    by chunk_size however many payments are exported.
     
     Args:
         payments: QuerySet of Payment objects
-        filename: Output filename
+        chunk_size: Rows fetched per database round trip
     
-    Returns:
-        str: CSV content
+    Yields:
+        list: One CSV row
     """
-    import csv
-    from io import StringIO
-    
-    output = StringIO()
-    writer = csv.writer(output)
+    method_labels = dict(Payment.PAYMENT_METHOD_CHOICES)
     
-    # Write headers
-    writer.writerow([
+    # Headers
+    yield [
         'Receipt Number',
         'Student Name',
         'Student Email',
@@ -414,22 +430,78 @@ def export_payment_report_csv(payments, filename='payment_report.csv'):
         'Payment Method',
         'Received By',
         'Notes'
-    ])
+    ]
     
-    # Write data
-    for payment in payments:
-        writer.writerow([
-            payment.receipt_number,
-            payment.get_student_name(),
-            payment.enrollment.student.email,
-            payment.get_course_title(),
-            payment.amount,
-            payment.payment_date,
-            payment.get_payment_method_display(),
-            payment.received_by.get_full_name() if payment.received_by else 'N/A',
-            payment.notes
-        ])
+    rows = payments.values_list(
+        'receipt_number',
+        'enrollment__student__first_name',
+        'enrollment__student__last_name',
+        'enrollment__student__email',
+        'enrollment__course__title',
+        'amount',
+        'payment_date',
+        'payment_method',
+        'received_by_id',
+        'received_by__first_name',
+        'received_by__last_name',
+        'notes'
+    ).iterator(chunk_size=chunk_size)
+    
+    for (receipt_number, first_name, last_name, email, course_title, amount,
+         payment_date, method, received_by_id, received_first, received_last,
+         notes) in rows:
+        yield [
+            receipt_number,
+            f"{first_name} {last_name}".strip(),
+            email,
+            course_title,
+            amount,
+            payment_date,
+            method_labels.get(method, method),
+            f"{received_first} {received_last}".strip() if received_by_id else 'N/A',
+            notes
+        ]
+
+
+def write_payment_report_csv(payments, output, chunk_size=2000):
+    """
+    Stream payment data as CSV into a file-like object.
+    
+    Args:
+        payments: QuerySet of Payment objects
+        output: Writable text file object
+        chunk_size: Rows fetched per database round trip
     
+    Returns:
+        int: Number of payment rows written
+    """
+    import csv
+    
+    writer = csv.writer(output)
+    
+    count = -1  # The header row is not a payment
+    for row in iter_payment_report_rows(payments, chunk_size):
+        writer.writerow(row)
+        count += 1
+    
+    return count
+
+
+def export_payment_report_csv(payments, filename='payment_report.csv'):
+    """
+    Export payment data to CSV format.
+    
+    Args:
+        payments: QuerySet of Payment objects
+        filename: Output filename
+    
+    Returns:
+        str: CSV content
+    """
+    from io import StringIO
+    
+    output = StringIO()
+    write_payment_report_csv(payments, output)
     return output.getvalue()
 
 
@@ -443,11 +515,19 @@ def bulk_payment_validation(payment_data_list):
     Returns:
         tuple: (is_valid, errors_list)
     """
-    from enrollments.models import Enrollment
-    from .models import Payment
-    
     errors = []
     
+    # Load every referenced enrollment with its course and paid total at once
+    enrollment_ids = set()
+    for payment_data in payment_data_list:
+        try:
+            enrollment_ids.add(int(payment_data.get('enrollment_id')))
+        except (ValueError, TypeError):
+            pass
+    enrollments = Enrollment.objects.with_payment_totals().select_related(
+        'course'
+    ).in_bulk(enrollment_ids)
+    
     for i, payment_data in enumerate(payment_data_list):
         # Validate required fields
         required_fields = ['enrollment_id', 'amount', 'payment_method']
@@ -461,8 +541,10 @@ def bulk_payment_validation(payment_data_list):
         
         # Validate enrollment exists
         try:
-            enrollment = Enrollment.objects.get(id=payment_data['enrollment_id'])
-        except Enrollment.DoesNotExist:
+            enrollment = enrollments.get(int(payment_data['enrollment_id']))
+        except (ValueError, TypeError):
+            enrollment = None
+        if enrollment is None:
             errors.append({
                 'index': i,
                 'error': f"Enrollment {payment_data['enrollment_id']} does not exist"
@@ -471,14 +553,16 @@ def bulk_payment_validation(payment_data_list):
         
         # Validate amount
         try:
-            amount = Decimal(str(payment_data['amount']))
+            amount = to_decimal(payment_data['amount'])
             if amount <= 0:
                 errors.append({
                     'index': i,
                     'error': "Payment amount must be greater than zero"
                 })
                 continue
-        except (ValueError, TypeError):
+            if amount != amount.quantize(CENT):
+                raise ValueError()
+        except (ValueError, TypeError, ArithmeticError):
             errors.append({
                 'index': i,
                 'error': "Invalid amount format"
@@ -636,8 +720,6 @@ def get_payment_trends(days=30):
     Returns:
         dict: Trend analysis data
     """
-    from .models import Payment
-    
     end_date = timezone.now().date()
     start_date = end_date - timedelta(days=days)
     
@@ -646,22 +728,31 @@ def get_payment_trends(days=30):
         payment_date__lte=end_date
     )
     
+    # Per-day counts in one GROUP BY; everything below is derived from them
+    counts_by_date = dict(
+        payments.order_by().values('payment_date').annotate(
+            count=Count('id')
+        ).values_list('payment_date', 'count')
+    )
+    
     # Daily payment count
     daily_counts = {}
     current_date = start_date
     while current_date <= end_date:
-        count = payments.filter(payment_date=current_date).count()
-        daily_counts[current_date.strftime('%Y-%m-%d')] = count
+        daily_counts[current_date.strftime('%Y-%m-%d')] = counts_by_date.get(current_date, 0)
         current_date += timedelta(days=1)
     
     # Calculate trend
-    total_payments = payments.count()
+    total_payments = sum(counts_by_date.values())
     avg_per_day = total_payments / days if days > 0 else 0
     
     # Compare first half vs second half
     mid_date = start_date + timedelta(days=days//2)
-    first_half = payments.filter(payment_date__lt=mid_date).count()
-    second_half = payments.filter(payment_date__gte=mid_date).count()
+    first_half = sum(
+        count for payment_date, count in counts_by_date.items()
+        if payment_date < mid_date
+    )
+    second_half = total_payments - first_half
     
     trend = 'increasing' if second_half > first_half else 'decreasing' if second_half < first_half else 'stable'
     
@@ -683,14 +774,19 @@ def get_payment_completion_rate():
     Returns:
         dict: Completion rate statistics
     """
-    from enrollments.models import Enrollment
-    from .models import Payment
-    
-    all_enrollments = Enrollment.objects.filter(
+    # Bucket every enrollment by its paid total in a single query
+    counts = Enrollment.objects.filter(
         status__in=['IN_PROGRESS', 'COMPLETED']
+    ).with_payment_totals().aggregate(
+        total=Count('id'),
+        fully_paid=Count('id', filter=Q(_total_paid__gte=F('course__price'))),
+        partially_paid=Count(
+            'id',
+            filter=Q(_total_paid__gt=0, _total_paid__lt=F('course__price'))
+        )
     )
     
-    total_enrollments = all_enrollments.count()
+    total_enrollments = counts['total']
     if total_enrollments == 0:
         return {
             'total_enrollments': 0,
@@ -700,20 +796,9 @@ def get_payment_completion_rate():
             'completion_rate': 0.0
         }
     
-    fully_paid = 0
-    partially_paid = 0
-    unpaid = 0
-    
-    for enrollment in all_enrollments:
-        total_paid = Payment.get_total_paid_for_enrollment(enrollment)
-        course_price = enrollment.course.price
-        
-        if total_paid >= course_price:
-            fully_paid += 1
-        elif total_paid > 0:
-            partially_paid += 1
-        else:
-            unpaid += 1
+    fully_paid = counts['fully_paid']
+    partially_paid = counts['partially_paid']
+    unpaid = total_enrollments - fully_paid - partially_paid
     
     completion_rate = (fully_paid / total_enrollments) * 100
     
@@ -736,9 +821,11 @@ def reconcile_enrollment_payments(enrollment):
     Returns:
         dict: Reconciliation report
     """
-    from .models import Payment
-    
-    payments = Payment.objects.filter(enrollment=enrollment).order_by('payment_date')
+    payments = list(
+        Payment.objects.filter(enrollment=enrollment).only(
+            'receipt_number', 'payment_date', 'amount', 'payment_method'
+        ).order_by('payment_date')
+    )
     
     course_price = enrollment.course.price
     total_paid = sum(p.amount for p in payments)
@@ -766,7 +853,7 @@ def reconcile_enrollment_payments(enrollment):
         'course_price': course_price,
         'total_paid': total_paid,
         'outstanding': outstanding,
-        'payment_count': payments.count(),
+        'payment_count': len(payments),
         'payments': payment_details,
         'is_reconciled': is_reconciled,
         'discrepancy': Decimal('0.00') if is_reconciled else outstanding - running_balance
@@ -780,20 +867,22 @@ def get_payment_method_statistics():
     Returns:
         list: Statistics per payment method
     """
-    from .models import Payment
+    # Per-method figures in one GROUP BY
+    rows = {
+        row['payment_method']: row
+        for row in Payment.objects.order_by().values('payment_method').annotate(
+            total_revenue=Sum('amount'),
+            payment_count=Count('id'),
+            average_payment=Avg('amount')
+        )
+    }
     
     method_stats = []
     
     for method_code, method_name in Payment.PAYMENT_METHOD_CHOICES:
-        payments = Payment.objects.filter(payment_method=method_code)
+        stats = rows.get(method_code)
         
-        if payments.exists():
-            stats = payments.aggregate(
-                total_revenue=Sum('amount'),
-                payment_count=Count('id'),
-                average_payment=Avg('amount')
-            )
-            
+        if stats:
             method_stats.append({
                 'method_code': method_code,
                 'method_name': method_name,
@@ -824,9 +913,6 @@ def generate_payment_aging_report():
     Returns:
         dict: Aging report with categorized outstanding balances
     """
-    from enrollments.models import Enrollment
-    from .models import Payment
-    
     today = timezone.now().date()
     
     aging_categories = {
@@ -836,33 +922,39 @@ def generate_payment_aging_report():
         'over_90': []
     }
     
+    # Only enrollments with an outstanding balance, filtered in SQL, and
+    # only the columns the report rows use
     enrollments = Enrollment.objects.filter(
         status__in=['IN_PROGRESS', 'COMPLETED']
-    ).select_related('student', 'course')
+    ).with_payment_totals().filter(
+        _total_paid__lt=F('course__price')
+    ).select_related('student', 'course').only(
+        'id', 'enrollment_date',
+        'student__first_name', 'student__last_name',
+        'course__title', 'course__price'
+    )
     
     for enrollment in enrollments:
         outstanding = Payment.get_outstanding_balance(enrollment)
+        days_outstanding = (today - enrollment.enrollment_date).days
         
-        if outstanding > 0:
-            days_outstanding = (today - enrollment.enrollment_date).days
-            
-            item = {
-                'enrollment_id': enrollment.id,
-                'student_name': enrollment.student.get_full_name(),
-                'course_title': enrollment.course.title,
-                'outstanding_balance': float(outstanding),
-                'days_outstanding': days_outstanding,
-                'enrollment_date': enrollment.enrollment_date
-            }
-            
-            if days_outstanding <= 30:
-                aging_categories['current'].append(item)
-            elif days_outstanding <= 60:
-                aging_categories['31_60'].append(item)
-            elif days_outstanding <= 90:
-                aging_categories['61_90'].append(item)
-            else:
-                aging_categories['over_90'].append(item)
+        item = {
+            'enrollment_id': enrollment.id,
+            'student_name': enrollment.student.get_full_name(),
+            'course_title': enrollment.course.title,
+            'outstanding_balance': float(outstanding),
+            'days_outstanding': days_outstanding,
+            'enrollment_date': enrollment.enrollment_date
+        }
+        
+        if days_outstanding <= 30:
+            aging_categories['current'].append(item)
+        elif days_outstanding <= 60:
+            aging_categories['31_60'].append(item)
+        elif days_outstanding <= 90:
+            aging_categories['61_90'].append(item)
+        else:
+            aging_categories['over_90'].append(item)
     
     # Calculate totals
     totals = {}
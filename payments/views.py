@@ -1,11 +1,19 @@
+import csv
 from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.pagination import CursorPagination
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Sum, Count, Q, Avg
+from django.conf import settings
+from django.core.cache import cache
+from django.http import StreamingHttpResponse
+from django.db.models import (
+    Sum, Count, Q, Avg, Max, F, Value, CharField, DecimalField, ExpressionWrapper, Prefetch
+)
+from django.db.models.functions import Concat, Trim, TruncMonth
 from django.utils import timezone
-from datetime import timedelta
+from datetime import date, timedelta
 from decimal import Decimal
 
 from .models import Payment
@@ -19,6 +27,22 @@ from .serializers import (
 )
 from .permissions import IsAdminOrFinance, IsAdminOrRegistrarOrFinance
 from .filters import PaymentFilter
+from .utils import iter_payment_report_rows
+from enrollments.views import Echo
+
+# Seconds to keep a computed statistics payload
+STATISTICS_CACHE_TIMEOUT = 300
+
+# Seconds to keep a computed revenue report
+REPORT_CACHE_TIMEOUT = 600
+
+
+class OutstandingCursorPagination(CursorPagination):
+    """Keyset pagination over enrollments, highest outstanding balance first."""
+    
+    ordering = ('-_outstanding', '-enrollment_date', '-id')
+    page_size_query_param = 'page_size'
+    max_page_size = 100
 
 
 class PaymentViewSet(viewsets.ModelViewSet):
@@ -66,11 +90,14 @@ class PaymentViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """Filter queryset based on query parameters."""
-        queryset = Payment.objects.select_related(
-            'enrollment__student',
-            'enrollment__course',
-            'received_by'
-        )
+        if self.action in ['list', 'retrieve']:
+            queryset = self.get_serializer_class().prefetch_queryset(Payment.objects.all())
+        else:
+            queryset = Payment.objects.select_related(
+                'enrollment__student',
+                'enrollment__course',
+                'received_by'
+            )
         
         # Filter by student
         student_id = self.request.query_params.get('student', None)
@@ -103,31 +130,36 @@ class PaymentViewSet(viewsets.ModelViewSet):
         
         return queryset
     
+    def _revenue_by_method(self, queryset):
+        """Return {method: revenue} for methods with revenue, in one GROUP BY."""
+        totals = dict(
+            queryset.order_by().values('payment_method').annotate(
+                total=Sum('amount')
+            ).values_list('payment_method', 'total')
+        )
+        return {
+            method: float(totals[method])
+            for method, _ in Payment.PAYMENT_METHOD_CHOICES
+            if totals.get(method) and totals[method] > 0
+        }
+    
     @action(detail=False, methods=['get'])
     def summary(self, request):
         """Get overall payment summary."""
         queryset = self.get_queryset()
         
-        total_revenue = queryset.aggregate(
-            total=Sum('amount')
-        )['total'] or Decimal('0.00')
-        
-        payment_count = queryset.count()
-        
-        # Average payment amount
-        avg_payment = queryset.aggregate(
+        # Total, count and average in one aggregate
+        stats = queryset.aggregate(
+            total=Sum('amount'),
+            count=Count('id'),
             avg=Avg('amount')
-        )['avg'] or Decimal('0.00')
+        )
+        total_revenue = stats['total'] or Decimal('0.00')
+        payment_count = stats['count']
+        avg_payment = stats['avg'] or Decimal('0.00')
         
         # By payment method
-        by_method = {}
-        for method, _ in Payment.PAYMENT_METHOD_CHOICES:
-            method_total = queryset.filter(
-                payment_method=method
-            ).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-            
-            if method_total > 0:
-                by_method[method] = float(method_total)
+        by_method = self._revenue_by_method(queryset)
         
         return Response({
             'total_revenue': total_revenue,
@@ -136,57 +168,35 @@ class PaymentViewSet(viewsets.ModelViewSet):
             'by_method': by_method
         })
     
-    @action(detail=False, methods=['get'])
+    @action(
+        detail=False,
+        methods=['get'],
+        pagination_class=OutstandingCursorPagination,
+        filter_backends=[]
+    )
     def outstanding(self, request):
         """Get enrollments with outstanding payments."""
         from enrollments.models import Enrollment
         
-        # Get all active enrollments
+        # Active enrollments with a balance left; the totals, filter and
+        # keyset pagination all run in SQL, ordered by the paginator
         enrollments = Enrollment.objects.filter(
             status__in=['IN_PROGRESS', 'COMPLETED']
+        ).with_payment_totals().annotate(
+            _last_payment_date=Max('payments__payment_date'),
+            _outstanding=ExpressionWrapper(
+                F('course__price') - F('_total_paid'),
+                output_field=DecimalField(max_digits=10, decimal_places=2)
+            )
+        ).filter(
+            _total_paid__lt=F('course__price')
         ).select_related('student', 'course')
         
-        outstanding_list = []
-        
-        for enrollment in enrollments:
-            total_paid = Payment.get_total_paid_for_enrollment(enrollment)
-            outstanding = enrollment.course.price - total_paid
-            
-            if outstanding > 0:
-                # Get last payment date
-                last_payment = Payment.objects.filter(
-                    enrollment=enrollment
-                ).order_by('-payment_date').first()
-                
-                days_since_enrollment = (timezone.now().date() - enrollment.enrollment_date).days
-                
-                outstanding_list.append({
-                    'enrollment_id': enrollment.id,
-                    'student_id': enrollment.student.id,
-                    'student_name': enrollment.student.get_full_name(),
-                    'student_email': enrollment.student.email,
-                    'student_phone': enrollment.student.phone_number,
-                    'course_id': enrollment.course.id,
-                    'course_title': enrollment.course.title,
-                    'enrollment_date': enrollment.enrollment_date,
-                    'course_price': enrollment.course.price,
-                    'total_paid': total_paid,
-                    'outstanding_balance': outstanding,
-                    'last_payment_date': last_payment.payment_date if last_payment else None,
-                    'days_since_enrollment': days_since_enrollment
-                })
-        
-        # Sort by outstanding balance (highest first)
-        outstanding_list.sort(key=lambda x: x['outstanding_balance'], reverse=True)
-        
-        # Paginate
-        page = self.paginate_queryset(outstanding_list)
-        if page is not None:
-            serializer = OutstandingPaymentSerializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
-        
-        serializer = OutstandingPaymentSerializer(outstanding_list, many=True)
-        return Response(serializer.data)
+        page = self.paginate_queryset(enrollments)
+        serializer = OutstandingPaymentSerializer(
+            page, many=True, context={'today': timezone.now().date()}
+        )
+        return self.get_paginated_response(serializer.data)
     
     @action(detail=False, methods=['get'])
     def reports(self, request):
@@ -196,40 +206,42 @@ class PaymentViewSet(viewsets.ModelViewSet):
         end_date = request.query_params.get('end_date')
         period = request.query_params.get('period', 'month')  # day, week, month, year
         
-        if not start_date:
-            start_date = timezone.now().date() - timedelta(days=30)
-        else:
-            start_date = timezone.datetime.strptime(start_date, '%Y-%m-%d').date()
-        
-        if not end_date:
-            end_date = timezone.now().date()
-        else:
-            end_date = timezone.datetime.strptime(end_date, '%Y-%m-%d').date()
-        
+        today = timezone.now().date()
+        try:
+            start_date = date.fromisoformat(start_date) if start_date else today - timedelta(days=30)
+            end_date = date.fromisoformat(end_date) if end_date else today
+        except ValueError:
+            return Response(
+                {'error': 'Dates must be in YYYY-MM-DD format.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Reports share the statistics version, so any payment, course or
+        # enrollment change retires every cached range at once
+        data = cache.get_or_set(
+            f"{Payment.statistics_cache_key()}:report:{start_date}:{end_date}",
+            lambda: self._build_report(start_date, end_date),
+            REPORT_CACHE_TIMEOUT
+        )
+        return Response(data)
+    
+    def _build_report(self, start_date, end_date):
+        """Compute the revenue report payload for a date range."""
         queryset = Payment.objects.filter(
             payment_date__gte=start_date,
             payment_date__lte=end_date
         )
         
-        # Total revenue
-        total_revenue = queryset.aggregate(
-            total=Sum('amount')
-        )['total'] or Decimal('0.00')
-        
-        payment_count = queryset.count()
+        # Total revenue and count in one aggregate
+        stats = queryset.aggregate(total=Sum('amount'), count=Count('id'))
+        total_revenue = stats['total'] or Decimal('0.00')
+        payment_count = stats['count']
         
         # Average payment
         avg_payment = total_revenue / payment_count if payment_count > 0 else Decimal('0.00')
         
         # By payment method
-        by_method = {}
-        for method, _ in Payment.PAYMENT_METHOD_CHOICES:
-            method_total = queryset.filter(
-                payment_method=method
-            ).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-            
-            if method_total > 0:
-                by_method[method] = float(method_total)
+        by_method = self._revenue_by_method(queryset)
         
         # By course
         from courses.models import Course
@@ -248,19 +260,17 @@ class PaymentViewSet(viewsets.ModelViewSet):
             for course in courses
         ]
         
-        # Daily breakdown
-        daily_breakdown = []
-        current_date = start_date
-        while current_date <= end_date:
-            daily_total = queryset.filter(
-                payment_date=current_date
-            ).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-            
-            daily_breakdown.append({
-                'date': current_date.strftime('%Y-%m-%d'),
-                'revenue': float(daily_total)
-            })
-            current_date += timedelta(days=1)
+        # Daily breakdown from one GROUP BY, with empty days filled in
+        daily_totals = dict(
+            queryset.order_by().values('payment_date').annotate(
+                total=Sum('amount')
+            ).values_list('payment_date', 'total')
+        )
+        days = (start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1))
+        daily_breakdown = [
+            {'date': day.isoformat(), 'revenue': float(daily_totals.get(day) or 0)}
+            for day in days
+        ]
         
         report_data = {
             'period': f"{start_date} to {end_date}",
@@ -272,93 +282,143 @@ class PaymentViewSet(viewsets.ModelViewSet):
             'daily_breakdown': daily_breakdown
         }
         
-        serializer = RevenueReportSerializer(report_data)
-        return Response(serializer.data)
+        return dict(RevenueReportSerializer(report_data).data)
+    
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Stream the filtered payments as CSV."""
+        rows = iter_payment_report_rows(
+            self.filter_queryset(self.get_queryset()),
+            chunk_size=settings.PAYMENT_EXPORT_CHUNK_SIZE
+        )
+        writer = csv.writer(Echo())
+        
+        response = StreamingHttpResponse(
+            (writer.writerow(row) for row in rows),
+            content_type='text/csv'
+        )
+        response['Content-Disposition'] = 'attachment; filename="payments.csv"'
+        return response
     
     @action(detail=False, methods=['get'])
     def statistics(self, request):
         """Get comprehensive payment statistics."""
-        # Total revenue (all time)
-        total_revenue = Payment.objects.aggregate(
-            total=Sum('amount')
-        )['total'] or Decimal('0.00')
-        
-        total_payments = Payment.objects.count()
+        data = cache.get_or_set(
+            Payment.statistics_cache_key(),
+            self._build_statistics,
+            STATISTICS_CACHE_TIMEOUT
+        )
+        return Response(data)
+    
+    def _build_statistics(self):
+        """Compute the statistics payload."""
+        # Totals and per-method revenue (all time) from one GROUP BY
+        summary = Payment.get_revenue_summary()
+        total_revenue = summary['total_revenue']
+        total_payments = summary['payment_count']
         
         # Calculate total outstanding
         from enrollments.models import Enrollment
         all_enrollments = Enrollment.objects.filter(
             status__in=['IN_PROGRESS', 'COMPLETED']
-        )
+        ).with_payment_totals().select_related('course', 'student')
         
         total_outstanding = Decimal('0.00')
+        outstanding_by_student_id = {}
         for enrollment in all_enrollments:
             outstanding = Payment.get_outstanding_balance(enrollment)
             if outstanding > 0:
                 total_outstanding += outstanding
-        
-        # Revenue this month
+                
+                # Collected here for the per-student ranking below, which
+                # only lists users who still have the STUDENT role
+                student = enrollment.student
+                if student.role != 'STUDENT':
+                    continue
+                if student.id in outstanding_by_student_id:
+                    outstanding_by_student_id[student.id]['outstanding_balance'] += outstanding
+                else:
+                    outstanding_by_student_id[student.id] = {
+                        'student_id': student.id,
+                        'student_name': student.get_full_name(),
+                        'outstanding_balance': outstanding
+                    }
+        
+        # Revenue this month and this year, in one pass over this year's rows
         today = timezone.now().date()
         first_day_of_month = today.replace(day=1)
-        revenue_this_month = Payment.objects.filter(
-            payment_date__gte=first_day_of_month
-        ).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-        
-        # Revenue this year
         first_day_of_year = today.replace(month=1, day=1)
-        revenue_this_year = Payment.objects.filter(
+        period_totals = Payment.objects.filter(
             payment_date__gte=first_day_of_year
-        ).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
+        ).aggregate(
+            month=Sum('amount', filter=Q(payment_date__gte=first_day_of_month)),
+            year=Sum('amount')
+        )
+        revenue_this_month = period_totals['month'] or Decimal('0.00')
+        revenue_this_year = period_totals['year'] or Decimal('0.00')
         
         # Payments by method
-        payments_by_method = {}
-        for method, _ in Payment.PAYMENT_METHOD_CHOICES:
-            method_total = Payment.objects.filter(
-                payment_method=method
-            ).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-            
-            if method_total > 0:
-                payments_by_method[method] = float(method_total)
-        
-        # Revenue by month (last 12 months)
-        twelve_months_ago = today - timedelta(days=365)
-        revenue_by_month = []
-        
-        for i in range(12):
-            month_start = twelve_months_ago + timedelta(days=30*i)
-            month_end = month_start + timedelta(days=30)
-            month_revenue = Payment.objects.filter(
-                payment_date__gte=month_start,
-                payment_date__lt=month_end
-            ).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-            
-            revenue_by_month.append({
+        payments_by_method = {
+            method: float(total)
+            for method, total in summary['by_method'].items()
+        }
+        
+        # Revenue by calendar month (last 12 months, including this one)
+        month_starts = []
+        year, month = today.year, today.month
+        for _ in range(12):
+            month_starts.append(date(year, month, 1))
+            year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+        month_starts.reverse()
+        
+        monthly_totals = {
+            row['month']: row['total']
+            for row in Payment.objects.filter(
+                payment_date__gte=month_starts[0]
+            ).annotate(
+                month=TruncMonth('payment_date')
+            ).order_by().values('month').annotate(total=Sum('amount'))
+        }
+        revenue_by_month = [
+            {
                 'month': month_start.strftime('%Y-%m'),
-                'revenue': float(month_revenue)
-            })
+                'revenue': float(monthly_totals.get(month_start) or 0)
+            }
+            for month_start in month_starts
+        ]
         
-        # Top paying students
+        # Top paying students; the filter and the Sum share one join chain,
+        # so each payment is counted once. The name is built in SQL and rows
+        # come back as dicts, so no User instances are created.
         from accounts.models import User
         students = User.objects.filter(
             role='STUDENT',
             enrollments__payments__isnull=False
-        ).annotate(
+        ).values('id').annotate(
+            full_name=Trim(Concat(
+                'first_name', Value(' '), 'last_name',
+                output_field=CharField()
+            )),
             total_paid=Sum('enrollments__payments__amount')
         ).order_by('-total_paid')[:10]
         
         top_paying_students = [
             {
-                'student_id': student.id,
-                'student_name': student.get_full_name(),
-                'total_paid': float(student.total_paid)
+                'student_id': student['id'],
+                'student_name': student['full_name'],
+                'total_paid': float(student['total_paid'])
             }
             for student in students
         ]
         
-        # Recent payments
+        # Recent payments, loading only the columns listed below
         recent = Payment.objects.select_related(
             'enrollment__student',
             'enrollment__course'
+        ).only(
+            'id', 'receipt_number', 'amount', 'payment_date', 'payment_method',
+            'enrollment__student__first_name', 'enrollment__student__last_name',
+            'enrollment__course__title'
         ).order_by('-payment_date', '-created_at')[:5]
         
         recent_payments = [
@@ -374,29 +434,14 @@ class PaymentViewSet(viewsets.ModelViewSet):
             for p in recent
         ]
         
-        # Outstanding by student (top 10)
-        outstanding_by_student = []
-        students_with_outstanding = User.objects.filter(
-            role='STUDENT',
-            enrollments__status__in=['IN_PROGRESS', 'COMPLETED']
-        ).distinct()
-        
-        for student in students_with_outstanding:
-            student_outstanding = Decimal('0.00')
-            for enrollment in student.enrollments.filter(status__in=['IN_PROGRESS', 'COMPLETED']):
-                outstanding = Payment.get_outstanding_balance(enrollment)
-                if outstanding > 0:
-                    student_outstanding += outstanding
-            
-            if student_outstanding > 0:
-                outstanding_by_student.append({
-                    'student_id': student.id,
-                    'student_name': student.get_full_name(),
-                    'outstanding_balance': float(student_outstanding)
-                })
-        
-        outstanding_by_student.sort(key=lambda x: x['outstanding_balance'], reverse=True)
-        outstanding_by_student = outstanding_by_student[:10]
+        # Outstanding by student (top 10), from the enrollments loaded above
+        outstanding_by_student = sorted(
+            outstanding_by_student_id.values(),
+            key=lambda x: x['outstanding_balance'],
+            reverse=True
+        )[:10]
+        for row in outstanding_by_student:
+            row['outstanding_balance'] = float(row['outstanding_balance'])
         
         data = {
             'total_revenue': float(total_revenue),
@@ -411,8 +456,7 @@ class PaymentViewSet(viewsets.ModelViewSet):
             'outstanding_by_student': outstanding_by_student
         }
         
-        serializer = PaymentStatisticsSerializer(data)
-        return Response(serializer.data)
+        return dict(PaymentStatisticsSerializer(data).data)
     
     @action(detail=False, methods=['post'])
     def bulk_create(self, request):
@@ -420,31 +464,8 @@ class PaymentViewSet(viewsets.ModelViewSet):
         serializer = BulkPaymentSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
-        from enrollments.models import Enrollment
-        
-        payments_data = serializer.validated_data['payments']
-        created_payments = []
-        errors = []
-        
-        for i, payment_data in enumerate(payments_data):
-            try:
-                enrollment = Enrollment.objects.get(id=payment_data['enrollment_id'])
-                
-                payment = Payment.objects.create(
-                    enrollment=enrollment,
-                    amount=Decimal(str(payment_data['amount'])),
-                    payment_method=payment_data['payment_method'],
-                    payment_date=payment_data.get('payment_date', timezone.now().date()),
-                    notes=payment_data.get('notes', ''),
-                    received_by=request.user
-                )
-                created_payments.append(payment)
-            except Exception as e:
-                errors.append({
-                    'index': i + 1,
-                    'enrollment_id': payment_data.get('enrollment_id'),
-                    'error': str(e)
-                })
+        # Every row was validated up front, so the batch is inserted at once
+        created_payments = serializer.save(received_by=request.user)
         
         response_data = {
             'message': f'Successfully created {len(created_payments)} payment(s).',
@@ -452,9 +473,6 @@ class PaymentViewSet(viewsets.ModelViewSet):
             'payments': PaymentListSerializer(created_payments, many=True).data
         }
         
-        if errors:
-            response_data['errors'] = errors
-        
         return Response(response_data, status=status.HTTP_201_CREATED)
 
 
@@ -469,19 +487,22 @@ class StudentPaymentViewSet(viewsets.ReadOnlyModelViewSet):
     
     def get_queryset(self):
         """Return only the current user's payments."""
-        return Payment.objects.filter(
-            enrollment__student=self.request.user
-        ).select_related('enrollment__course')
+        return StudentPaymentSerializer.prefetch_queryset(
+            Payment.objects.filter(enrollment__student=self.request.user)
+        )
     
     @action(detail=False, methods=['get'])
     def summary(self, request):
         """Get student's payment summary across all enrollments."""
         from enrollments.models import Enrollment
         
-        # Get all student's enrollments
+        # Get all student's enrollments with their paid totals and payments
+        # (newest first) loaded up front
         enrollments = Enrollment.objects.filter(
             student=request.user
-        ).select_related('course')
+        ).with_payment_totals().select_related('student', 'course').prefetch_related(
+            Prefetch('payments', queryset=Payment.objects.order_by('-payment_date', '-created_at'))
+        )
         
         total_paid = Decimal('0.00')
         total_outstanding = Decimal('0.00')
@@ -493,8 +514,8 @@ class StudentPaymentViewSet(viewsets.ReadOnlyModelViewSet):
         
         for enrollment in enrollments:
             course_price = enrollment.course.price
-            payments = Payment.objects.filter(enrollment=enrollment)
-            payments_total = payments.aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
+            payments = enrollment.payments.all()
+            payments_total = enrollment._total_paid
             outstanding = course_price - payments_total
             
             total_paid += payments_total
@@ -510,7 +531,7 @@ class StudentPaymentViewSet(viewsets.ReadOnlyModelViewSet):
                 unpaid_count += 1
             
             # Get last payment date
-            last_payment = payments.order_by('-payment_date').first()
+            last_payment = payments[0] if payments else None
             
             by_enrollment.append({
                 'enrollment_id': enrollment.id,
@@ -523,9 +544,9 @@ class StudentPaymentViewSet(viewsets.ReadOnlyModelViewSet):
                 'total_paid': payments_total,
                 'outstanding_balance': max(outstanding, Decimal('0.00')),
                 'is_fully_paid': outstanding <= 0,
-                'payment_count': payments.count(),
+                'payment_count': enrollment._payment_count,
                 'last_payment_date': last_payment.payment_date if last_payment else None,
-                'payments': PaymentListSerializer(payments, many=True).data
+                'payments': payments
             })
         
         summary_data = {